@@ -52,7 +52,8 @@ class SlowModel:
         time.sleep(3)  # Simulate slow prediction
         return 0.75
 
-# This will timeout and kill the process
-model = SlowModel()
-result = predict_with_timeout(model, "test_data", timeout=1.0)
-print(f"Result: {result}")  # Will print -1.0 due to timeout
+if __name__ == "__main__":
+    # This will timeout and kill the process
+    model = SlowModel()
+    result = predict_with_timeout(model, "test_data", timeout=1.0)
+    print(f"Result: {result}")  # Will print -1.0 due to timeout
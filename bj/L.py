@@ -1,4 +1,7 @@
 import multiprocessing
+import multiprocessing.connection
+import queue
+import threading
 import time
 
 class KillableProcessPool:
@@ -60,17 +63,253 @@ class KillableProcessPool:
         except Exception as e:
             result_queue.put(f"Error: {str(e)}")
 
-# Usage:
-pool = KillableProcessPool(max_workers=4)
+def _warm_worker_main(conn, loader, loader_args):
+    """Warm worker loop: load the model once, then serve tasks until told to stop"""
+    try:
+        predict = loader(*loader_args)
+    except Exception as e:
+        conn.send(('error', f"Model load failed: {e}"))
+        return
+    conn.send(('ready', None))
+    
+    # A forked worker also holds the parent's end of the pipe and never sees EOF when the
+    # parent dies, so watch the parent's sentinel too (no orphaned workers after a crash)
+    parent = multiprocessing.parent_process()
+    waitables = [conn, parent.sentinel] if parent is not None else [conn]
+    while True:
+        if conn not in multiprocessing.connection.wait(waitables):
+            return
+        try:
+            args = conn.recv()
+        except EOFError:
+            return
+        if args is None:  # Shutdown
+            return
+        try:
+            conn.send(('success', predict(*args)))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+class WorkerUnavailable(Exception):
+    """No warm worker became free in time"""
+
+class _WarmWorker:
+    def __init__(self, loader, loader_args):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_warm_worker_main,
+            args=(child_conn, loader, loader_args),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+    
+    def wait_ready(self):
+        status, message = self.conn.recv()
+        if status != 'ready':
+            raise RuntimeError(message)
+    
+    def kill(self):
+        # TRUE KILL - same escalation as KillableProcessPool
+        self.process.terminate()  # SIGTERM
+        self.process.join(timeout=0.1)
+        if self.process.is_alive():
+            self.process.kill()   # SIGKILL
+            self.process.join()
+        self.conn.close()
+
+class WarmProcessPool:
+    """
+    Pool of pre-started workers that load the model once (loader(*loader_args) returns
+    the predict callable) and then serve tasks over a pipe.
+    A task that misses its deadline kills only the worker running it; a replacement is
+    started and warmed up in the background while the other workers keep serving.
+    """
+    
+    def __init__(self, loader, loader_args=(), max_workers=4):
+        self.loader = loader
+        self.loader_args = loader_args
+        self.max_workers = max_workers
+        self.idle_workers = queue.Queue()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.stats = {'tasks': 0, 'timeouts': 0, 'errors': 0, 'kills': 0, 'replacements': 0}
+        
+        # Start all workers first, then wait for every model load (they load in parallel)
+        workers = [_WarmWorker(loader, loader_args) for _ in range(max_workers)]
+        try:
+            for worker in workers:
+                worker.wait_ready()
+        except BaseException:
+            # One failed load fails the pool: stop every worker already started
+            for worker in workers:
+                worker.kill()
+            raise
+        for worker in workers:
+            self.idle_workers.put(worker)
+    
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+    
+    def _replace_worker(self):
+        """Start and warm up a replacement worker (runs in a background thread)"""
+        try:
+            worker = _WarmWorker(self.loader, self.loader_args)
+            worker.wait_ready()
+        except Exception as e:
+            print(f"Failed to start replacement worker: {e}")
+            return
+        self._count('replacements')
+        self._release(worker)
+    
+    def _release(self, worker):
+        """Return a healthy worker to the idle queue, or stop it if the pool has shut down"""
+        # Checked and queued under the lock shutdown() drains with, so no worker slips in after
+        with self.lock:
+            if not self.closed:
+                self.idle_workers.put(worker)
+                return
+        self._stop(worker)
+    
+    @staticmethod
+    def _stop(worker):
+        try:
+            worker.conn.send(None)
+        except OSError:
+            pass
+        worker.process.join(timeout=1)
+        if worker.process.is_alive():
+            worker.kill()
+    
+    def _retire(self, worker):
+        worker.kill()
+        self._count('kills')
+        threading.Thread(target=self._replace_worker, daemon=True).start()
+    
+    def run(self, *args, timeout=2.0, acquire_timeout=None, deadline=None):
+        """
+        Run predict(*args) on a warm worker and return its result.
+        Raises WorkerUnavailable if no worker frees up within acquire_timeout (None waits),
+        TimeoutError if the deadline passes (that worker is killed), RuntimeError on task errors.
+        An absolute time.monotonic() deadline, if given, replaces timeout and also covers
+        the wait for a worker.
+        """
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0.0)
+            acquire_timeout = remaining if acquire_timeout is None else min(acquire_timeout, remaining)
+        try:
+            worker = self.idle_workers.get(timeout=acquire_timeout)
+        except queue.Empty:
+            raise WorkerUnavailable(f"No worker available within {acquire_timeout}s")
+        if deadline is not None:
+            timeout = max(deadline - time.monotonic(), 0.0)
+        
+        self._count('tasks')
+        try:
+            worker.conn.send(args)
+        except (EOFError, OSError):  # Worker died while idle
+            self._retire(worker)
+            raise RuntimeError("Worker died before the task was sent")
+        except Exception as e:
+            # Arguments failed to pickle; nothing was written, so the worker is still clean
+            self._release(worker)
+            self._count('errors')
+            raise RuntimeError(f"Task could not be sent to the worker: {e}") from e
+        except BaseException:
+            self._release(worker)
+            raise
+        
+        # From here the worker holds our task: it goes back to the pool only after a full
+        # reply, anything else (timeout, death, interrupt) retires it
+        finished = False
+        try:
+            if worker.conn.poll(timeout):
+                status, result = worker.conn.recv()
+                finished = True
+        except (EOFError, OSError):  # Worker died mid-task
+            raise RuntimeError("Worker died during prediction")
+        finally:
+            if finished:
+                self._release(worker)
+            else:
+                self._retire(worker)
+        
+        if not finished:
+            print(f"Timeout occurred - terminated worker {worker.process.pid}")
+            self._count('timeouts')
+            raise TimeoutError(f"Prediction timed out after {timeout} seconds")
+        
+        if status != 'success':
+            self._count('errors')
+            raise RuntimeError(result)
+        return result
+    
+    def submit_with_killable_timeout(self, *args, timeout=2.0, default_value=-1.0, acquire_timeout=0.1):
+        """Run predict(*args) on a warm worker; on timeout kill that worker and return default_value"""
+        try:
+            return self.run(*args, timeout=timeout, acquire_timeout=acquire_timeout)
+        except (WorkerUnavailable, TimeoutError):
+            return default_value
+        except RuntimeError as e:
+            print(f"Prediction error: {e}")
+            return default_value
+    
+    def shutdown(self):
+        """Stop all idle workers (busy ones are stopped when their task returns or times out)"""
+        with self.lock:
+            self.closed = True
+            idle = []
+            while True:
+                try:
+                    idle.append(self.idle_workers.get_nowait())
+                except queue.Empty:
+                    break
+        for worker in idle:
+            self._stop(worker)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.shutdown()
 
 def slow_prediction(data):
     time.sleep(5)  # Simulate slow ML prediction
     return 0.75
 
-# This will timeout after 1 second and KILL the process
-result = pool.submit_with_killable_timeout(
-    slow_prediction, 
-    "test_data", 
-    timeout=1.0
-)
-print(f"Result: {result}")  # -1.0 (timeout), but process is actually killed
+class DemoModel:
+    def predict(self, data):
+        if data == "hang":
+            time.sleep(5)  # Simulate a hung ML prediction
+        return 0.75
+
+def load_demo_model():
+    """Runs once per warm worker"""
+    time.sleep(0.5)  # Simulate model import / load
+    return DemoModel().predict
+
+# Usage:
+if __name__ == "__main__":
+    pool = KillableProcessPool(max_workers=4)
+    
+    # This will timeout after 1 second and KILL the process
+    result = pool.submit_with_killable_timeout(
+        slow_prediction, 
+        "test_data", 
+        timeout=1.0
+    )
+    print(f"Result: {result}")  # -1.0 (timeout), but process is actually killed
+    
+    # Warm pool: model loaded once per worker, only the hung worker is killed
+    with WarmProcessPool(load_demo_model, max_workers=4) as warm_pool:
+        start = time.time()
+        for _ in range(100):
+            warm_pool.submit_with_killable_timeout("test_data", timeout=1.0)
+        print(f"Warm pool latency: {(time.time() - start) * 10:.2f} ms per prediction")
+        
+        result = warm_pool.submit_with_killable_timeout("hang", timeout=1.0)
+        print(f"Result: {result}")  # -1.0, the hung worker was killed
+        print(f"Result: {warm_pool.submit_with_killable_timeout('test_data', timeout=1.0)}")  # Other workers keep serving
+        time.sleep(1)
+        print(f"Stats: {warm_pool.stats}")
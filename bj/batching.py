@@ -0,0 +1,236 @@
+import asyncio
+import bisect
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from L import WarmProcessPool, WorkerUnavailable
+
+# Latency histogram bucket upper bounds (milliseconds)
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+
+class QueueFullError(Exception):
+    """The wait queue is at capacity (backpressure: retry later or shed load)"""
+
+class _Task:
+    __slots__ = ('data', 'deadline', 'submitted', 'future')
+
+    def __init__(self, data, deadline):
+        self.data = data
+        self.deadline = deadline
+        self.submitted = time.monotonic()
+        self.future = Future()
+
+class BatchingPool:
+    """
+    Futures / asyncio front end for a WarmProcessPool.
+    Queued inputs are micro-batched into a single worker call: loader(*loader_args) must
+    return a batch predict callable taking a list of inputs and returning a list of outputs.
+
+    Every task carries its own deadline. A batch is sent with the earliest deadline of its
+    tasks, so a hung batch is killed before any member's deadline passes (its batch-mates
+    fail with TimeoutError too). Tasks that expire while still queued are failed without
+    being sent. The wait queue is bounded: submit raises QueueFullError instead of
+    silently returning a default value.
+    """
+
+    def __init__(self, loader, loader_args=(), max_workers=4, max_batch_size=32, max_batch_wait=0.005,
+                 max_queue_size=1000, default_timeout=2.0):
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait
+        self.default_timeout = default_timeout
+        self.tasks = queue.Queue(maxsize=max_queue_size)
+        self.pool = WarmProcessPool(loader, loader_args, max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.closed = False
+        self.counters = {'submitted': 0, 'rejected': 0, 'completed': 0, 'errors': 0,
+                         'timeouts': 0, 'expired_in_queue': 0, 'batches': 0, 'batched_tasks': 0}
+        self.latency_histogram = [0] * len(LATENCY_BUCKETS_MS)
+
+        # One dispatcher per worker, so every warm worker can have a batch in flight
+        self.dispatchers = [
+            threading.Thread(target=self._dispatch_loop, daemon=True)
+            for _ in range(max_workers)
+        ]
+        for dispatcher in self.dispatchers:
+            dispatcher.start()
+
+    def _count(self, key, n=1):
+        with self.lock:
+            self.counters[key] += n
+
+    def _finish(self, task, result=None, error=None):
+        """Resolve a task claimed with set_running_or_notify_cancel (it can no longer be cancelled)"""
+        latency_ms = (time.monotonic() - task.submitted) * 1000
+        with self.lock:
+            self.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+            self.counters['completed' if error is None else 'errors'] += 1
+        if error is None:
+            task.future.set_result(result)
+        else:
+            task.future.set_exception(error)
+
+    def _collect_batch(self):
+        """Block for one task, then gather more for up to max_batch_wait"""
+        batch = [self.tasks.get()]
+        if batch[0] is None:
+            self.tasks.put(None)  # Leave the shutdown marker for the other dispatchers
+            return None
+        batch_until = time.monotonic() + self.max_batch_wait
+        while len(batch) < self.max_batch_size:
+            remaining = batch_until - time.monotonic()
+            try:
+                task = self.tasks.get(timeout=remaining) if remaining > 0 else self.tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is None:
+                self.tasks.put(None)  # Leave the shutdown marker for the other dispatchers
+                break
+            batch.append(task)
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+
+            now = time.monotonic()
+            live = []
+            for task in batch:
+                # Claiming the future atomically drops cancelled tasks and blocks later cancels
+                if not task.future.set_running_or_notify_cancel():
+                    continue
+                if task.deadline <= now:
+                    self._count('expired_in_queue')
+                    self._count('timeouts')
+                    self._finish(task, error=TimeoutError("Deadline passed while queued"))
+                else:
+                    live.append(task)
+            if not live:
+                continue
+
+            self._count('batches')
+            self._count('batched_tasks', len(live))
+            deadline = min(task.deadline for task in live)
+            try:
+                # Waiting for a free worker counts against the deadline too
+                results = self.pool.run([task.data for task in live], deadline=deadline)
+            except (TimeoutError, WorkerUnavailable) as e:
+                self._count('timeouts', len(live))
+                for task in live:
+                    self._finish(task, error=e)
+                continue
+            except Exception as e:
+                for task in live:
+                    self._finish(task, error=e)
+                continue
+
+            if len(results) != len(live):
+                error = RuntimeError(f"Batch predict returned {len(results)} results for {len(live)} inputs")
+                for task in live:
+                    self._finish(task, error=error)
+                continue
+            for task, result in zip(live, results):
+                self._finish(task, result=result)
+
+    def submit(self, data, timeout=None, block=False, block_timeout=None):
+        """
+        Queue one input and return a concurrent.futures.Future for its result.
+        timeout is the task's deadline from now. When the queue is full this raises
+        QueueFullError immediately, or after waiting up to block_timeout if block is set.
+        """
+        if self.closed:
+            raise RuntimeError("Pool is shut down")
+        task = _Task(data, time.monotonic() + (timeout if timeout is not None else self.default_timeout))
+        try:
+            self.tasks.put(task, block=block, timeout=block_timeout)
+        except queue.Full:
+            self._count('rejected')
+            raise QueueFullError(f"Wait queue full ({self.tasks.maxsize} tasks)")
+        self._count('submitted')
+        return task.future
+
+    def submit_many(self, inputs, timeout=None, block=False, block_timeout=None):
+        """Queue several inputs; returns one future per input"""
+        return [self.submit(data, timeout=timeout, block=block, block_timeout=block_timeout) for data in inputs]
+
+    def predict(self, data, timeout=None):
+        """Blocking convenience wrapper"""
+        return self.submit(data, timeout=timeout).result()
+
+    async def predict_async(self, data, timeout=None):
+        """Awaitable prediction; QueueFullError is raised to the caller right away"""
+        return await asyncio.wrap_future(self.submit(data, timeout=timeout))
+
+    def metrics(self):
+        """Queue depth, counters, worker kills and the latency histogram"""
+        with self.lock:
+            counters = dict(self.counters)
+            histogram = list(self.latency_histogram)
+        pool_stats = dict(self.pool.stats)
+        return {
+            'queue_depth': self.tasks.qsize(),
+            'queue_capacity': self.tasks.maxsize,
+            **counters,
+            'mean_batch_size': counters['batched_tasks'] / counters['batches'] if counters['batches'] else 0.0,
+            'kills': pool_stats['kills'],
+            'replacements': pool_stats['replacements'],
+            'latency_histogram_ms': {
+                (f"<={bound}" if bound != float('inf') else f">{LATENCY_BUCKETS_MS[-2]}"): count
+                for bound, count in zip(LATENCY_BUCKETS_MS, histogram)
+            }
+        }
+
+    def shutdown(self):
+        """Fail queued tasks, stop the dispatchers and the workers"""
+        self.closed = True
+        while True:
+            try:
+                task = self.tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None and task.future.set_running_or_notify_cancel():
+                self._finish(task, error=RuntimeError("Pool shut down"))
+        self.tasks.put(None)
+        for dispatcher in self.dispatchers:
+            dispatcher.join(timeout=5)
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+class DemoBatchModel:
+    def predict_batch(self, inputs):
+        if "hang" in inputs:
+            time.sleep(5)  # Simulate a hung ML prediction
+        return [0.75 for _ in inputs]
+
+def load_demo_batch_model():
+    """Runs once per warm worker"""
+    return DemoBatchModel().predict_batch
+
+# Usage:
+if __name__ == "__main__":
+    with BatchingPool(load_demo_batch_model, max_workers=2, max_queue_size=10000) as pool:
+        start = time.time()
+        futures = pool.submit_many(range(5000), timeout=2.0)
+        results = [future.result() for future in futures]
+        print(f"{len(results)} predictions in {time.time() - start:.2f}s")
+
+        hung = pool.submit("hang", timeout=1.0)
+        try:
+            hung.result()
+        except TimeoutError as e:
+            print(f"Timed out: {e}")
+
+        async def main():
+            return await asyncio.gather(*(pool.predict_async(i, timeout=1.0) for i in range(100)))
+        print(f"Async results: {len(asyncio.run(main()))}")
+
+        time.sleep(1)
+        print(pool.metrics())
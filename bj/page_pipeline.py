@@ -0,0 +1,88 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from watermark import apply_overlay, centered_overlay, tiled_overlay
+
+DEFAULT_WATERMARK_TEXT = "COPY FOR\nREFERENCE\nONLY"
+
+# Per-worker state, set once by the pool initializer
+_worker_document = None
+_worker_options = None
+
+def _init_worker(pdf_path, options):
+    """Each worker opens the PDF itself, so only page numbers cross process boundaries"""
+    global _worker_document, _worker_options
+    _worker_document = fitz.open(pdf_path)
+    _worker_options = options
+
+def render_page(document, page_num, dpi):
+    """Rasterize one page straight into a PIL image (no intermediate PPM encode)"""
+    matrix = fitz.Matrix(dpi / 72, dpi / 72)  # 72 is default DPI
+    pix = document[page_num].get_pixmap(matrix=matrix, alpha=False)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+def _process_page(page_num, document=None, options=None):
+    """Render, watermark and PNG-encode one page; returns (page_num, filename)"""
+    document = document or _worker_document
+    options = options or _worker_options
+    image = render_page(document, page_num, options['dpi'])
+
+    # Overlays are cached per worker, keyed by (text, page size, ...), so same-size pages reuse one
+    if options['style'] == 'centered':
+        overlay = centered_overlay(options['text'], image.size)
+    else:
+        overlay = tiled_overlay(options['text'], image.size)
+    watermarked = apply_overlay(image, overlay)
+
+    output_filename = f"{options['output_prefix']}_{page_num + 1}.png"
+    watermarked.save(output_filename, "PNG")
+    return page_num, output_filename
+
+def watermark_pdf_pages(pdf_path, output_prefix="page", dpi=200, style='tiled', watermark_text=DEFAULT_WATERMARK_TEXT,
+                        workers=None, max_in_flight=None):
+    """
+    Streaming page pipeline: pages are rendered one at a time with PyMuPDF, watermarked
+    and encoded in a process pool. At most max_in_flight pages are queued or being
+    processed at once, so peak memory stays flat regardless of page count.
+    Returns output filenames in page order.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    options = {'dpi': dpi, 'style': style, 'text': watermark_text, 'output_prefix': output_prefix}
+
+    with fitz.open(pdf_path) as document:
+        page_count = len(document)
+        if workers == 1:
+            filenames = []
+            for page_num in range(page_count):
+                filenames.append(_process_page(page_num, document, options)[1])
+                print(f"Saved: {filenames[-1]}")
+            return filenames
+
+    filenames = [None] * page_count
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path, options)) as executor:
+        in_flight = set()
+        next_page = 0
+        while next_page < page_count or in_flight:
+            # Keep the window full, but never more than max_in_flight pages outstanding
+            while next_page < page_count and len(in_flight) < max_in_flight:
+                in_flight.add(executor.submit(_process_page, next_page))
+                next_page += 1
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_num, output_filename = future.result()
+                filenames[page_num] = output_filename
+                print(f"Saved: {output_filename}")
+
+    elapsed = time.time() - start
+    print(f"Watermarked {page_count} pages in {elapsed:.1f}s ({page_count / elapsed:.1f} pages/s) on {workers} workers")
+    return filenames
+
+# Example usage
+if __name__ == "__main__":
+    watermark_pdf_pages("input.pdf")
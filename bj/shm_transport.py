@@ -0,0 +1,247 @@
+import functools
+import itertools
+import multiprocessing
+import os
+import time
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from K import predict_worker
+from L import WarmProcessPool, WorkerUnavailable
+
+_tracker_shared = {}
+
+def _shares_parent_tracker():
+    """
+    True in a multiprocessing child that reports to its parent's resource tracker:
+    spawn/forkserver children always do, fork children when the parent's tracker was
+    already running at fork time. Unregistering there would drop the parent's own
+    registration and a crashed parent would leak the segment. Decided once per process,
+    before this process can have started a tracker of its own.
+    """
+    pid = os.getpid()
+    if pid not in _tracker_shared:
+        _tracker_shared[pid] = (multiprocessing.parent_process() is not None
+                                and resource_tracker._resource_tracker._fd is not None)
+    return _tracker_shared[pid]
+
+class SharedMemoryTransport:
+    """
+    Moves NumPy arrays and bytes between processes through multiprocessing.shared_memory
+    segments; only a small handle tuple travels through the pipe/queue.
+    Payloads smaller than min_size (and any other object) are sent inline.
+
+    Handles: ('inline', obj), ('bytes', name, size), ('ndarray', name, shape, dtype)
+    """
+
+    def __init__(self, min_size=64 * 1024):
+        self.min_size = min_size
+
+    def encode(self, obj, name, track=True):
+        """
+        Copy obj into a new segment called name and return its handle.
+        Workers pass track=False: the parent owns every segment's lifetime, so a separate
+        resource tracker must not unlink (or warn about) segments the parent still uses.
+        Multiprocessing children share the parent's tracker and keep the registration.
+        """
+        if isinstance(obj, np.ndarray) and obj.nbytes >= self.min_size:
+            segment = shared_memory.SharedMemory(name=name, create=True, size=obj.nbytes)
+            np.ndarray(obj.shape, dtype=obj.dtype, buffer=segment.buf)[...] = obj
+            handle = ('ndarray', name, obj.shape, obj.dtype.str)
+        elif isinstance(obj, (bytes, bytearray, memoryview)) and len(obj) >= self.min_size:
+            segment = shared_memory.SharedMemory(name=name, create=True, size=len(obj))
+            segment.buf[:len(obj)] = obj
+            handle = ('bytes', name, len(obj))
+        else:
+            return ('inline', obj)
+        if not track and not _shares_parent_tracker():
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        segment.close()
+        return handle
+
+    @staticmethod
+    def decode(handle, copy=True, track=True):
+        """
+        Rebuild the payload of a handle. With copy=False an ndarray is a zero-copy view and
+        the segment is returned too (keep it open while the view is in use, then close it).
+        """
+        kind = handle[0]
+        if kind == 'inline':
+            return handle[1] if copy else (handle[1], None)
+        segment = shared_memory.SharedMemory(name=handle[1])
+        if not track and not _shares_parent_tracker():
+            # Attaching registers the segment with this process's tracker too (Python < 3.13)
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        if kind == 'ndarray':
+            view = np.ndarray(handle[2], dtype=np.dtype(handle[3]), buffer=segment.buf)
+            if not copy:
+                return view, segment
+            payload = view.copy()
+            del view
+        else:
+            payload = bytes(segment.buf[:handle[2]])
+        segment.close()
+        return payload
+
+    @staticmethod
+    def unlink(name):
+        """Remove a segment by name if it exists (safe to call for segments never created)"""
+        try:
+            segment = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            return
+        segment.close()
+        segment.unlink()
+
+    def release(self, handle):
+        if handle is not None and handle[0] != 'inline':
+            self.unlink(handle[1])
+
+def _shm_predict(predict, transport, in_handle, out_name):
+    """Worker side: zero-copy view of the input, result written to the segment the parent named"""
+    data, segment = transport.decode(in_handle, copy=False, track=False)
+    try:
+        result = predict(data)
+    finally:
+        del data
+        if segment is not None:
+            segment.close()
+    return transport.encode(result, out_name, track=False)
+
+class _ShmLoader:
+    """Picklable loader wrapper: loads the model once, returns the shared-memory predict"""
+
+    def __init__(self, loader, transport):
+        self.loader = loader
+        self.transport = transport
+
+    def __call__(self, *loader_args):
+        predict = self.loader(*loader_args)
+        return lambda in_handle, out_name: _shm_predict(predict, self.transport, in_handle, out_name)
+
+class SharedMemoryPool:
+    """
+    WarmProcessPool whose inputs and results travel through shared memory.
+
+    The parent names every segment (input and result) per task, so it always knows what to
+    unlink: after a normal result, after an error, and after a worker is SIGKILLed
+    mid-task (the result segment may or may not exist at that point). Workers report to
+    the parent's resource tracker and keep their registrations, so segments left by a
+    crashed parent are removed by that tracker once the parent and its workers have exited.
+    """
+
+    def __init__(self, loader, loader_args=(), max_workers=4, min_size=64 * 1024):
+        self.transport = SharedMemoryTransport(min_size=min_size)
+        # Started before the workers so that they all share it, whatever the start method
+        resource_tracker.ensure_running()
+        self.pool = WarmProcessPool(_ShmLoader(loader, self.transport), loader_args, max_workers=max_workers)
+        # Short per-pool prefix: segment names are limited to ~30 characters on macOS
+        self.prefix = f"kp{os.getpid()}{uuid.uuid4().hex[:6]}"
+        self.task_ids = itertools.count()
+
+    @property
+    def stats(self):
+        return self.pool.stats
+
+    def run(self, data, timeout=2.0, acquire_timeout=None, deadline=None):
+        """Same contract as WarmProcessPool.run, with shared-memory payload transfer"""
+        task_id = next(self.task_ids)
+        in_name, out_name = f"{self.prefix}i{task_id}", f"{self.prefix}o{task_id}"
+        in_handle = self.transport.encode(data, in_name)
+        out_handle = None
+        try:
+            out_handle = self.pool.run(in_handle, out_name, timeout=timeout,
+                                       acquire_timeout=acquire_timeout, deadline=deadline)
+            return self.transport.decode(out_handle)
+        finally:
+            self.transport.release(in_handle)
+            if out_handle is not None:
+                self.transport.release(out_handle)
+            else:
+                # Worker killed or failed: it may have created the result segment already
+                self.transport.unlink(out_name)
+
+    def submit_with_killable_timeout(self, data, timeout=2.0, default_value=-1.0, acquire_timeout=0.1):
+        try:
+            return self.run(data, timeout=timeout, acquire_timeout=acquire_timeout)
+        except (WorkerUnavailable, TimeoutError):
+            return default_value
+        except RuntimeError as e:
+            print(f"Prediction error: {e}")
+            return default_value
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+def predict_with_timeout_shm(model, data, timeout=2.0, default_value=-1.0, transport=None):
+    """K.predict_with_timeout with the input and result passed through shared memory"""
+    transport = transport or SharedMemoryTransport()
+    prefix = f"kp{os.getpid()}{uuid.uuid4().hex[:6]}"
+    in_handle = transport.encode(data, prefix + 'i')
+    out_name = prefix + 'o'
+    result_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=predict_worker,
+        args=(functools.partial(_shm_predict, model.predict, transport, out_name=out_name), in_handle, result_queue)
+    )
+    process.start()
+    
+    try:
+        result_type, result = result_queue.get(timeout=timeout)
+        process.join()
+        if result_type == 'success':
+            return transport.decode(result)
+        print(f"Prediction error: {result}")
+        return default_value
+    except Exception:  # Queue.Empty timeout
+        print(f"Prediction timed out after {timeout} seconds - terminating process")
+        process.terminate()
+        process.join(timeout=1)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        return default_value
+    finally:
+        # Parent owns both segments, whether the child finished, failed or was killed
+        transport.release(in_handle)
+        transport.unlink(out_name)
+
+class DemoImageModel:
+    def predict(self, image):
+        if image[0, 0, 0] == 255:
+            time.sleep(5)  # Simulate a hung prediction
+        return image[::4, ::4].copy()  # Downsampled image back (3MB result)
+
+def load_demo_image_model():
+    return DemoImageModel().predict
+
+# Usage:
+if __name__ == "__main__":
+    image = np.random.RandomState(0).randint(0, 200, size=(2000, 2000, 3), dtype=np.uint8)
+
+    with WarmProcessPool(load_demo_image_model, max_workers=2) as pickled_pool:
+        start = time.time()
+        for _ in range(20):
+            pickled_pool.run(image)
+        print(f"Pickled transfer: {(time.time() - start) * 50:.1f} ms per 12MB image")
+
+    with SharedMemoryPool(load_demo_image_model, max_workers=2) as shm_pool:
+        start = time.time()
+        for _ in range(20):
+            result = shm_pool.run(image)
+        print(f"Shared memory transfer: {(time.time() - start) * 50:.1f} ms per 12MB image, result {result.shape}")
+
+        hung = image.copy()
+        hung[0, 0, 0] = 255
+        print(f"Result: {shm_pool.submit_with_killable_timeout(hung, timeout=1.0)}")  # -1.0, worker killed
+        print(f"One-shot result: {predict_with_timeout_shm(DemoImageModel(), image).shape}")
+        leaked = [name for name in os.listdir('/dev/shm') if name.startswith(shm_pool.prefix)] if os.path.isdir('/dev/shm') else []
+        print(f"Leaked segments after kill: {leaked}")
@@ -0,0 +1,147 @@
+import os
+import time
+
+import fitz  # PyMuPDF
+
+from page_pipeline import DEFAULT_WATERMARK_TEXT, watermark_pdf_pages
+
+STAMP_FONT = "hebo"  # Base-14 Helvetica-Bold, closest to arialbd.ttf and never embedded
+STAMP_COLOR = (1, 0, 0)
+STAMP_OPACITY = 128 / 255  # Same alpha as the raster fill (255, 0, 0, 128)
+REFERENCE_DPI = 200  # Raster sizes (36px font, 10px spacing, 100px gap) are defined at this DPI
+
+def _px(pixels):
+    """Raster pixel size at REFERENCE_DPI in PDF points"""
+    return pixels * 72 / REFERENCE_DPI
+
+def _block_size(lines, font, fontsize):
+    width = max(font.text_length(line, fontsize=fontsize) for line in lines)
+    return width, len(lines) * fontsize + (len(lines) - 1) * _px(10)
+
+def fit_font_size(lines, font, max_height, max_width, low=1.0, high=1000.0):
+    """Largest font size (binary search, 0.1pt resolution) whose block fits the box"""
+    while high - low > 0.1:
+        size = (low + high) / 2
+        width, height = _block_size(lines, font, size)
+        if height <= max_height and width <= max_width:
+            low = size
+        else:
+            high = size
+    return low
+
+def _write_block(page, lines, font, fontsize, center):
+    """Centered multi-line block, rotated 45 degrees counter-clockwise about its center"""
+    width, height = _block_size(lines, font, fontsize)
+    writer = fitz.TextWriter(page.rect, opacity=STAMP_OPACITY, color=STAMP_COLOR)
+    top = center.y - height / 2
+    for i, line in enumerate(lines):
+        line_width = font.text_length(line, fontsize=fontsize)
+        baseline = top + (i + 1) * fontsize + i * _px(10) - fontsize * 0.2
+        writer.append((center.x - line_width / 2, baseline), line, font=font, fontsize=fontsize)
+    writer.write_text(page, morph=(center, fitz.Matrix(45)))
+    return width, height
+
+def build_stamp(stamp_document, page_rect, watermark_text=DEFAULT_WATERMARK_TEXT, style='tiled'):
+    """Add one stamp page of the given size to stamp_document and return its page number"""
+    page = stamp_document.new_page(width=page_rect.width, height=page_rect.height)
+    font = fitz.Font(STAMP_FONT)
+    lines = watermark_text.split('\n')
+
+    if style == 'centered':
+        fontsize = fit_font_size(lines, font, page_rect.height * 0.4, page_rect.width * 0.8)
+        _write_block(page, lines, font, fontsize, page.rect.tl + (page.rect.width / 2, page.rect.height / 2))
+    else:
+        fontsize = _px(36)
+        width, height = _block_size(lines, font, fontsize)
+        # Bounding box of the rotated block plus the raster gap
+        step = (width + height) * 0.7071 + _px(100)
+        y = -step / 2
+        while y < page.rect.height + step:
+            x = -step / 2
+            while x < page.rect.width + step:
+                _write_block(page, lines, font, fontsize, fitz.Point(x, y))
+                x += step
+            y += step
+    return page.number
+
+def _size_key(rect):
+    return round(rect.width, 2), round(rect.height, 2)
+
+def watermark_pdf_vector(pdf_path, output_path, watermark_text=DEFAULT_WATERMARK_TEXT, style='tiled'):
+    """
+    Stamp the watermark into each page as vector content and write one PDF (no rasterizing).
+    One stamp page is built per distinct page size. show_pdf_page turns it into a Form
+    XObject once and every page of that size references the same XObject.
+    All stamp pages are built before the first show_pdf_page: MuPDF caches the graft map
+    of the stamp document, and adding pages to it afterwards breaks later grafts.
+    """
+    start = time.time()
+    stamps = fitz.open()
+    stamp_pages = {}
+    with fitz.open(pdf_path) as document:
+        for page in document:
+            key = _size_key(page.rect)
+            if key not in stamp_pages:
+                stamp_pages[key] = build_stamp(stamps, page.rect, watermark_text, style)
+        for page in document:
+            page.show_pdf_page(page.rect, stamps, stamp_pages[_size_key(page.rect)], overlay=True)
+        document.save(output_path, garbage=3, deflate=True)
+        page_count = len(document)
+    stamps.close()
+
+    elapsed = time.time() - start
+    print(f"Stamped {page_count} pages in {elapsed:.2f}s ({page_count / elapsed:.1f} pages/s) -> {output_path}")
+    return output_path
+
+def check_mixed_page_sizes(output_dir="watermark_check"):
+    """
+    Regression check: stamp a PDF whose page sizes alternate and make sure every page
+    got the watermark (this used to fail with 'source object number out of range')
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    sizes = [(612, 792), (842, 595), (612, 792), (300, 300), (842, 595)]
+    source_path = os.path.join(output_dir, "mixed_sizes.pdf")
+    with fitz.open() as document:
+        for width, height in sizes:
+            document.new_page(width=width, height=height).insert_text((50, 50), "page")
+        document.save(source_path)
+
+    output_path = watermark_pdf_vector(source_path, os.path.join(output_dir, "mixed_sizes_watermarked.pdf"))
+    with fitz.open(output_path) as document:
+        assert [_size_key(page.rect) for page in document] == [(float(w), float(h)) for w, h in sizes]
+        first_line = DEFAULT_WATERMARK_TEXT.split('\n')[0]
+        for page in document:
+            assert first_line in page.get_text(), f"page {page.number} has no stamp"
+    print(f"Mixed page sizes OK ({len(sizes)} pages, {len(set(sizes))} stamps)")
+
+def benchmark_watermark_modes(pdf_path, output_dir="watermark_benchmark", dpi=200, style='tiled', workers=None):
+    """Pages/sec and output bytes of the raster (PNG per page) and vector (single PDF) paths"""
+    os.makedirs(output_dir, exist_ok=True)
+    with fitz.open(pdf_path) as document:
+        page_count = len(document)
+
+    start = time.time()
+    filenames = watermark_pdf_pages(pdf_path, os.path.join(output_dir, "page"), dpi=dpi, style=style, workers=workers)
+    raster_seconds = time.time() - start
+    raster_bytes = sum(os.path.getsize(filename) for filename in filenames)
+
+    vector_path = os.path.join(output_dir, "watermarked.pdf")
+    start = time.time()
+    watermark_pdf_vector(pdf_path, vector_path, style=style)
+    vector_seconds = time.time() - start
+    vector_bytes = os.path.getsize(vector_path)
+
+    results = {
+        'pages': page_count,
+        'raster': {'seconds': raster_seconds, 'pages_per_second': page_count / raster_seconds, 'output_bytes': raster_bytes},
+        'vector': {'seconds': vector_seconds, 'pages_per_second': page_count / vector_seconds, 'output_bytes': vector_bytes},
+    }
+    print(f"{'mode':8} {'pages/s':>10} {'output bytes':>14}")
+    for mode in ('raster', 'vector'):
+        print(f"{mode:8} {results[mode]['pages_per_second']:10.1f} {results[mode]['output_bytes']:14d}")
+    return results
+
+# Example usage
+if __name__ == "__main__":
+    check_mixed_page_sizes()
+    watermark_pdf_vector("input.pdf", "watermarked.pdf")
@@ -0,0 +1,115 @@
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+# Same lookup order the scripts always used
+FONT_CANDIDATES = ("arialbd.ttf", "arial.ttf")
+WATERMARK_FILL = (255, 0, 0, 128)
+LINE_SPACING = 10
+
+@lru_cache(maxsize=None)
+def resolve_font_path(candidates=FONT_CANDIDATES):
+    """First loadable TrueType font, or None (resolved once per process)"""
+    for path in candidates:
+        try:
+            ImageFont.truetype(path, 10)
+            return path
+        except OSError:
+            continue
+    return None
+
+@lru_cache(maxsize=256)
+def load_font(size, font_path=None):
+    """Cached font object per (size, path); falls back to Pillow's default font"""
+    font_path = font_path or resolve_font_path()
+    if font_path is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(font_path, size)
+
+def measure_lines(lines, font):
+    """(widths, heights) of each line's bounding box"""
+    draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+    widths, heights = [], []
+    for line in lines:
+        bbox = draw.textbbox((0, 0), line, font=font)
+        widths.append(bbox[2] - bbox[0])
+        heights.append(bbox[3] - bbox[1])
+    return widths, heights
+
+def block_size(lines, font):
+    widths, heights = measure_lines(lines, font)
+    return max(widths), sum(heights) + (len(lines) - 1) * LINE_SPACING
+
+def fit_font_size(lines, max_height, max_width, font_path=None, min_size=1, max_size=1000):
+    """
+    Largest font size whose text block fits in max_height x max_width (binary search,
+    so about log2(max_size) font loads instead of one per 10% step)
+    """
+    low, high = min_size, max_size
+    best = min_size
+    while low <= high:
+        size = (low + high) // 2
+        width, height = block_size(lines, load_font(size, font_path))
+        if height <= max_height and width <= max_width:
+            best = size
+            low = size + 1
+        else:
+            high = size - 1
+    return best
+
+@lru_cache(maxsize=64)
+def rotated_tile(text, font_size, font_path=None, fill=WATERMARK_FILL, angle=45):
+    """The centered multi-line text block, rendered once and rotated (RGBA)"""
+    font = load_font(font_size, font_path)
+    lines = text.split('\n')
+    widths, heights = measure_lines(lines, font)
+    max_width = max(widths)
+    total_height = sum(heights) + (len(lines) - 1) * LINE_SPACING
+
+    text_block = Image.new('RGBA', (max_width, int(total_height)), (255, 255, 255, 0))
+    text_draw = ImageDraw.Draw(text_block)
+    y_offset = 0
+    for line, line_width, line_height in zip(lines, widths, heights):
+        x_offset = (max_width - line_width) // 2  # Center each line
+        text_draw.text((x_offset, y_offset), line, font=font, fill=fill)
+        y_offset += line_height + LINE_SPACING
+
+    return text_block.rotate(angle, expand=True)
+
+@lru_cache(maxsize=16)
+def tiled_overlay(text, page_size, font_size=36, font_path=None, gap=100):
+    """
+    Full-page RGBA overlay with the rotated tile repeated across it (bj/Reku.py style).
+    Keyed by (text, page size in pixels, font, ...): every page of the same size and DPI
+    reuses one overlay.
+    """
+    tile = rotated_tile(text, font_size, font_path)
+    overlay = Image.new('RGBA', page_size, (255, 255, 255, 0))
+    gap_x = tile.width + gap
+    gap_y = tile.height + gap
+    for y in range(-gap_y, page_size[1] + gap_y, gap_y):
+        for x in range(-gap_x, page_size[0] + gap_x, gap_x):
+            overlay.paste(tile, (x, y), tile)
+    return overlay
+
+@lru_cache(maxsize=16)
+def centered_overlay(text, page_size, height_ratio=0.4, font_path=None):
+    """
+    Full-page RGBA overlay with one large rotated block in the center (bj/Reku2.py style).
+    The block is sized to about height_ratio of the page height and at most 80% of its width.
+    """
+    width, height = page_size
+    lines = text.split('\n')
+    watermark_height = int(height * height_ratio)
+    if (font_path or resolve_font_path()) is None:
+        font_size = 10  # Pillow's default font cannot be resized reliably
+    else:
+        font_size = fit_font_size(lines, watermark_height, width * 0.8, font_path)
+
+    tile = rotated_tile(text, font_size, font_path)
+    overlay = Image.new('RGBA', page_size, (255, 255, 255, 0))
+    overlay.paste(tile, ((width - tile.width) // 2, (height - tile.height) // 2), tile)
+    return overlay
+
+def apply_overlay(image, overlay):
+    """Composite a cached overlay onto a page image"""
+    return Image.alpha_composite(image.convert('RGBA'), overlay).convert('RGB')
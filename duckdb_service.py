@@ -0,0 +1,341 @@
+"""
+Helpers shared by the DuckDB query services (Py, pyc and dku/Tesa): the bounded query
+thread pool, the streams it produces, the streamed /query responses and the background
+S3 credential refresher. The services are standalone scripts; this module sits next to
+Py and pyc, and dku/Tesa adds the repository root to sys.path.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import pyarrow as pa
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+
+# Streamed /query formats, chosen by the Accept header; everything else gets the JSON envelope
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+NDJSON_TYPE = "application/x-ndjson"
+RESPONSE_FORMATS = {
+    "application/json": "json",
+    ARROW_STREAM_TYPE: "arrow",
+    NDJSON_TYPE: "ndjson",
+    "application/ndjson": "ndjson"
+}
+STREAM_BATCH_ROWS = 10000
+
+
+class QueryPoolFull(Exception):
+    """Too many queries waiting for a worker thread"""
+
+
+class QueryPool:
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 256):
+        """Bounded thread pool for DuckDB queries; every worker thread keeps its own cursor"""
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="duckdb-query")
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.stats = {
+            'submitted': 0,
+            'started': 0,
+            'rejected': 0,
+            'completed': 0,
+            'cursors_created': 0,
+            'streams_active': 0,
+            'queue_wait_ms_total': 0.0,
+            'queue_wait_ms_max': 0.0
+        }
+
+    def cursor(self, conn):
+        """This thread's cursor over conn (a new one if conn has been replaced)"""
+        if getattr(self.local, 'conn', None) is not conn:
+            # cursor() is a separate connection to the same database, so threads run in parallel
+            self.local.cursor = conn.cursor()
+            self.local.conn = conn
+            with self.lock:
+                self.stats['cursors_created'] += 1
+        return self.local.cursor
+
+    def acquire(self):
+        """Reserve one of the max_pending slots; raises QueryPoolFull when none is left"""
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.stats['rejected'] += 1
+                raise QueryPoolFull(f"{self.pending} queries already pending")
+            self.pending += 1
+            self.stats['submitted'] += 1
+
+    def release(self):
+        with self.lock:
+            self.pending -= 1
+            self.stats['completed'] += 1
+
+    def _submit(self, fn, *args):
+        """fn(*args) on a pool thread, with its queue wait recorded; returns a concurrent Future"""
+        submitted = time.perf_counter()
+
+        def task():
+            wait_ms = (time.perf_counter() - submitted) * 1000
+            with self.lock:
+                self.stats['started'] += 1
+                self.stats['queue_wait_ms_total'] += wait_ms
+                self.stats['queue_wait_ms_max'] = max(self.stats['queue_wait_ms_max'], wait_ms)
+            return fn(*args)
+
+        return self.executor.submit(task)
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on a pool thread so the event loop never blocks on DuckDB"""
+        self.acquire()
+        try:
+            return await asyncio.wrap_future(self._submit(fn, *args))
+        finally:
+            self.release()
+
+    def stream(self, chunks, close) -> "PooledStream":
+        """Async iterator over chunks produced on pool threads; the caller has acquire()d its slot"""
+        return PooledStream(self, chunks, close)
+
+    def metrics(self) -> Dict:
+        """Pool size, current queue depth and queue wait times"""
+        with self.lock:
+            stats = dict(self.stats)
+            pending = self.pending
+        return {
+            "pool_size": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": pending,
+            "queued": max(0, pending - self.max_workers),
+            "submitted": stats['submitted'],
+            "rejected": stats['rejected'],
+            "completed": stats['completed'],
+            "cursors_created": stats['cursors_created'],
+            "streams_active": stats['streams_active'],
+            "mean_queue_wait_ms": round(stats['queue_wait_ms_total'] / stats['started'], 3) if stats['started'] else 0.0,
+            "max_queue_wait_ms": round(stats['queue_wait_ms_max'], 3)
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+class PooledStream:
+    """
+    Async iterator over a chunks generator whose items are produced on the query pool.
+    An open stream holds one of the pool's max_pending slots; close() gives it back and
+    calls the close callback (e.g. cursor.close), exactly once.
+    """
+    def __init__(self, pool: QueryPool, chunks, close):
+        self.pool = pool
+        self.chunks = chunks
+        self.close_source = close
+        self.pending = None
+        self.closed = False
+        with pool.lock:
+            pool.stats['streams_active'] += 1
+
+    async def __aiter__(self):
+        done = object()
+        try:
+            while not self.closed:
+                self.pending = self.pool._submit(next, self.chunks, done)
+                chunk = await asyncio.wrap_future(self.pending)
+                if chunk is done:
+                    break
+                if chunk:
+                    yield chunk
+        finally:
+            # Also runs when the client disconnects mid-stream
+            self.close()
+
+    def close(self):
+        """
+        Synchronous on purpose: after a disconnect the stream is cancelled and an await
+        here would be cancelled too. A next() still running on a pool thread is waited
+        for through its future, so the generator is never closed under it.
+        """
+        with self.pool.lock:
+            if self.closed:
+                return
+            self.closed = True
+        if self.pending is None:
+            self._finish()
+        else:
+            self.pending.add_done_callback(self._finish)
+
+    def _finish(self, _=None):
+        try:
+            self.chunks.close()
+            self.close_source()
+        finally:
+            with self.pool.lock:
+                self.pool.stats['streams_active'] -= 1
+            self.pool.release()
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """'json', 'arrow' or 'ndjson' for an Accept header (highest q wins, JSON by default)"""
+    candidates = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_type, *options = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for option in options:
+            if option.startswith("q="):
+                try:
+                    quality = float(option[2:])
+                except ValueError:
+                    quality = 0.0
+        if media_type.lower() in RESPONSE_FORMATS and quality > 0:
+            candidates.append((-quality, position, RESPONSE_FORMATS[media_type.lower()]))
+    return min(candidates)[2] if candidates else "json"
+
+
+class _ChunkSink:
+    """File-like target for the Arrow stream writer; take() hands over what was written so far"""
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def arrow_ipc_chunks(reader):
+    """Arrow IPC stream bytes, one chunk per record batch"""
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()  # Schema (for empty results) and end-of-stream marker
+
+
+def ndjson_chunks(reader):
+    """One JSON object per line; only one record batch is ever held as Python objects"""
+    for batch in reader:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in batch.to_pylist()).encode()
+
+
+async def streamed_query_response(manager, query: str, params: Optional[Dict], response_format: str) -> StreamingResponse:
+    """Arrow IPC or NDJSON response read incrementally from the manager's record batch reader"""
+    start_time = time.time()
+    pool = manager.query_pool
+    pool.acquire()  # Held for the whole stream, so open streams count against max_pending
+    try:
+        reader, cursor = await pool.run(manager.open_record_batch_reader, query, params)
+    except BaseException:
+        pool.release()
+        raise
+    if response_format == "arrow":
+        chunks, media_type = arrow_ipc_chunks(reader), ARROW_STREAM_TYPE
+    else:
+        chunks, media_type = ndjson_chunks(reader), NDJSON_TYPE
+    stream = pool.stream(chunks, cursor.close)
+    return StreamingResponse(
+        stream,
+        # Closes the stream even if the client left before the body was ever iterated
+        background=BackgroundTask(stream.close),
+        media_type=media_type,
+        headers={"X-Query-Time-Ms": str(round((time.time() - start_time) * 1000, 2))}
+    )
+
+
+class FakeSTSClient:
+    def __init__(self, duration_seconds: int = 3600):
+        """Local stand-in for boto3's STS client: every assume_role call issues new credentials"""
+        self.duration_seconds = duration_seconds
+        self.calls = 0
+
+    def assume_role(self, RoleArn: str, RoleSessionName: str, DurationSeconds: int = 3600):
+        self.calls += 1
+        return {
+            'Credentials': {
+                'AccessKeyId': f"FAKEACCESSKEY{self.calls}",
+                'SecretAccessKey': f"fake-secret-{self.calls}",
+                'SessionToken': f"fake-token-{self.calls}",
+                'Expiration': datetime.now(timezone.utc) + timedelta(seconds=self.duration_seconds)
+            }
+        }
+
+
+class CredentialRefresher:
+    def __init__(self, sts_manager, apply, check_interval: float = 60.0, retry_interval: float = 10.0):
+        """Background thread that re-applies S3 credentials (from an STSManager) to DuckDB only when STS rotates them"""
+        self.sts_manager = sts_manager
+        self.apply = apply  # Called with the new credentials dict
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self.applied = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats = {'checks': 0, 'rotations': 0, 'errors': 0, 'last_rotation': None}
+
+    def refresh_now(self, force: bool = False) -> bool:
+        """Fetch credentials (cached by STSManager) and apply them if they changed"""
+        credentials = self.sts_manager.get_credentials()
+        self.stats['checks'] += 1
+        if credentials == self.applied and not force:
+            return False
+        self.apply(credentials)
+        self.applied = credentials
+        self.stats['rotations'] += 1
+        self.stats['last_rotation'] = datetime.now().isoformat()
+        logger.info("S3 credentials applied to DuckDB")
+        return True
+
+    def _next_delay(self) -> float:
+        # Wake at the refresh point, but at least every check_interval
+        return max(1.0, min(self.check_interval, self.sts_manager.seconds_until_refresh()))
+
+    def _run(self):
+        # Nothing applied yet means the initial refresh in start() failed: retry soon
+        delay = self._next_delay() if self.applied is not None else self.retry_interval
+        while not self.stop_event.wait(delay):
+            try:
+                self.refresh_now()
+                delay = self._next_delay()
+            except Exception as e:
+                # Current credentials stay in place until they expire; keep retrying
+                self.stats['errors'] += 1
+                logger.error(f"Credential refresh failed: {str(e)}")
+                delay = self.retry_interval
+
+    def start(self):
+        """
+        Apply the current credentials, then keep them fresh in the background.
+        The thread starts even if this first refresh raises, so it keeps retrying.
+        """
+        try:
+            self.refresh_now(force=True)
+        finally:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="credential-refresher", daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def metrics(self) -> Dict:
+        return {**self.stats, "seconds_until_refresh": round(self.sts_manager.seconds_until_refresh(), 1)}
@@ -0,0 +1,384 @@
+import argparse
+import cProfile
+import json
+import platform
+import pstats
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+from models import IdentityRecord
+from normalization import NormalizationCache
+from utils import AbbreviationStandardizer
+from config import settings
+from blocking import BlockingIndex, find_candidates
+from fuzzy_index import MinHashLSHIndex
+from rule_based_matcher import RuleBasedIdentityMatcher
+from mm import MLIdentityMatcher
+from compiled_model import compile_forest
+
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+SINGLE_PREDICT_SAMPLE = 200
+ABBREVIATION_TABLE_SIZES = [9, 100, 500, 1000]
+LEGACY_ABBREVIATION_SAMPLE = 200
+DEFAULT_REPEATS = 3
+
+_FIRST_NAMES = [
+    'james', 'mary', 'robert', 'patricia', 'john', 'jennifer', 'michael', 'linda', 'william', 'elizabeth',
+    'david', 'barbara', 'richard', 'susan', 'joseph', 'jessica', 'thomas', 'sarah', 'charles', 'karen',
+    'christopher', 'nancy', 'daniel', 'lisa', 'matthew', 'betty', 'anthony', 'margaret', 'mark', 'sandra'
+]
+_SYLLABLES = ['ba', 'ker', 'son', 'ta', 'mil', 'ler', 'ro', 'wil', 'li', 'ams', 'jo', 'hn', 'da', 'vis', 'gar',
+              'cia', 'mar', 'tin', 'lo', 'pez', 'har', 'ris', 'cl', 'ark', 'le', 'wis', 'wal', 'ker', 'hal', 'ston']
+_STREETS = ['main', 'oak', 'pine', 'maple', 'cedar', 'elm', 'washington', 'lake', 'hill', 'park', 'view', 'sunset']
+_STREET_TYPES = [('Street', 'St'), ('Avenue', 'Ave'), ('Road', 'Rd'), ('Drive', 'Dr'), ('Lane', 'Ln'), ('Court', 'Ct')]
+_CITIES = ['Springfield', 'Riverside', 'Franklin', 'Greenville', 'Bristol', 'Clinton', 'Fairview', 'Salem']
+_DOMAINS = ['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'example.org']
+
+def _transpose(text: str, rng: random.Random) -> str:
+    """Swap two adjacent characters (a typical typing error)"""
+    if len(text) < 2:
+        return text
+    i = rng.randrange(len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+def generate_records(n: int, seed: int = 42, duplicate_rate: float = 0.3,
+                     typo_rate: float = 0.0) -> Tuple[List[IdentityRecord], List[Tuple[int, int]]]:
+    """
+    Reproducible synthetic record set (much faster than Faker at 1M rows).
+    Returns the records and the ground-truth duplicate pairs.
+    With typo_rate, that share of duplicates gets a transposed first name and last name
+    and a different phone, so they share no exact blocking key with their original.
+    """
+    rng = random.Random(seed)
+    records: List[IdentityRecord] = []
+    true_pairs: List[Tuple[int, int]] = []
+
+    while len(records) < n:
+        first = rng.choice(_FIRST_NAMES)
+        last = ''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3)))
+        street_type = rng.choice(_STREET_TYPES)
+        number = rng.randint(1, 9999)
+        street = rng.choice(_STREETS).title()
+        city = rng.choice(_CITIES)
+        phone = f"{rng.randint(200, 999)}{rng.randint(200, 999)}{rng.randint(0, 9999):04d}"
+        domain = rng.choice(_DOMAINS)
+
+        base_position = len(records)
+        records.append(IdentityRecord(
+            name=f"{first.title()} {last.title()}",
+            email=f"{first}.{last}@{domain}",
+            phone=f"{phone[:3]}-{phone[3:6]}-{phone[6:]}",
+            address=f"{number} {street} {street_type[0]}, {city}, USA"
+        ))
+
+        if len(records) < n and rng.random() < duplicate_rate:
+            true_pairs.append((base_position, len(records)))
+            if typo_rate and rng.random() < typo_rate:
+                first, last = _transpose(first, rng), _transpose(last, rng)
+                phone = f"{rng.randint(200, 999)}{rng.randint(200, 999)}{rng.randint(0, 9999):04d}"
+                number = rng.randint(1, 9999)
+            records.append(IdentityRecord(
+                name=f"{last.title()} {first.title()}" if rng.random() < 0.3 else f"{first.title()} {last.title()}",
+                email=f"{first}{last}{rng.randint(1, 99)}@{domain}",
+                phone=f"({phone[:3]}) {phone[3:6]}-{phone[6:]}",
+                address=f"{number} {street} {street_type[1]}, {city}, USA"
+            ))
+
+    return records, true_pairs
+
+def _timed(results: Dict[str, dict], name: str, n_ops: int, fn: Callable[[], object], repeats: int = 1):
+    """
+    Time fn() and record per-op cost.
+    With repeats > 1, fn() first runs once untimed as a warmup and the median of the
+    timed runs is reported, so fn must be repeatable (build any cold state inside it).
+    """
+    if repeats > 1:
+        fn()
+    runs = []
+    for _ in range(max(repeats, 1)):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    elapsed = statistics.median(runs)
+    results[name] = {
+        'ops': n_ops,
+        'repeats': len(runs),
+        'seconds': round(elapsed, 6),
+        'min_seconds': round(min(runs), 6),
+        'us_per_op': round(elapsed / n_ops * 1e6, 3) if n_ops else 0.0,
+        'ops_per_second': round(n_ops / elapsed, 1) if elapsed else 0.0
+    }
+    runs_note = f" (median of {len(runs)})" if len(runs) > 1 else ""
+    logger.info(f"{name}: {n_ops} ops in {elapsed:.3f}s{runs_note} ({results[name]['us_per_op']} us/op)")
+
+def _train_model(model_path: Optional[str], training_samples: int) -> MLIdentityMatcher:
+    """Load the model under test, or train a small one outside of the timed sections"""
+    ml_matcher = MLIdentityMatcher()
+    if model_path:
+        ml_matcher.load_model(model_path)
+    else:
+        ml_matcher.train(n_samples=training_samples)
+    return ml_matcher
+
+def benchmark_size(n_records: int, ml_matcher: MLIdentityMatcher, pair_sample: int, seed: int,
+                   repeats: int = 1) -> dict:
+    """All hot-path timings for one record-set size"""
+    results: Dict[str, dict] = {}
+    records, true_pairs = generate_records(n_records, seed=seed)
+
+    # Normalization (cold cache per run) and lazy address parsing (once, it is memoized per record)
+    def run_normalize():
+        cold = NormalizationCache(maxsize=n_records)
+        return [cold.get(record) for record in records]
+    _timed(results, 'normalize_records', n_records, run_normalize, repeats)
+    cache = NormalizationCache(maxsize=n_records)
+    normalized = [cache.get(record) for record in records]
+    _timed(results, 'parse_address', n_records, lambda: [record.address_parsed for record in normalized])
+
+    # Blocking on a cold private cache, so neither earlier sections nor the global cache warm it
+    blocking = {}
+    def run_blocking():
+        blocking['pairs'], blocking['stats'] = find_candidates(
+            records, true_pairs=true_pairs, cache=NormalizationCache(maxsize=n_records))
+    _timed(results, 'blocking', n_records, run_blocking, repeats)
+    pairs = blocking['pairs']
+    sample = pairs[:pair_sample]
+    sample_records = [(records[i], records[j]) for i, j in sample]
+    sample_normalized = [(normalized[i], normalized[j]) for i, j in sample]
+
+    # Individual comparators on warm normalized records
+    rule_matcher = RuleBasedIdentityMatcher(cache=cache)
+    for field, comparator in rule_matcher._comparators.items():
+        _timed(results, f'rule_{field}_comparator', len(sample),
+               lambda comparator=comparator: [comparator(n1, n2) for n1, n2 in sample_normalized], repeats)
+
+    _timed(results, 'rule_compute_similarity', len(sample),
+           lambda: [rule_matcher.compute_similarity(r1, r2) for r1, r2 in sample_records], repeats)
+    _timed(results, 'rule_score', len(sample),
+           lambda: [rule_matcher.score(r1, r2) for r1, r2 in sample_records], repeats)
+    _timed(results, 'rule_score_early_exit', len(sample),
+           lambda: [rule_matcher.score(r1, r2, early_exit=True) for r1, r2 in sample_records], repeats)
+
+    # ML feature extraction and prediction
+    ml_matcher.cache = cache
+    _timed(results, 'ml_extract_features', len(sample),
+           lambda: [ml_matcher._extract_features(r1, r2) for r1, r2 in sample_records], repeats)
+    # sklearn pays joblib dispatch per call, so single-pair predict uses a small sample
+    single = sample_records[:min(len(sample_records), SINGLE_PREDICT_SAMPLE)]
+    _timed(results, 'ml_predict_single', len(single),
+           lambda: [ml_matcher.predict_similarity(r1, r2) for r1, r2 in single], repeats)
+    _timed(results, 'ml_predict_batch', len(sample), lambda: ml_matcher.predict_similarity_batch(sample_records),
+           repeats)
+
+    if hasattr(ml_matcher.model, 'estimators_'):
+        compiled = compile_forest(ml_matcher.model, ml_matcher.scaler)
+        X = np.array([ml_matcher._extract_features(r1, r2) for r1, r2 in sample_records])
+        X_single = X[:len(single)]
+        _timed(results, 'compiled_predict_single', len(X_single),
+               lambda: [compiled.predict_proba(compiled.scaler.transform(row.reshape(1, -1))) for row in X_single],
+               repeats)
+        _timed(results, 'compiled_predict_batch', len(X), lambda: compiled.predict_proba(compiled.scaler.transform(X)),
+               repeats)
+
+    # End to end: cold normalization + blocking + compact scoring of every candidate pair.
+    # Blocking and scoring share one fresh cache per run; the global cache is never touched.
+    end_to_end = {}
+    def run_end_to_end():
+        cold = NormalizationCache(maxsize=n_records)
+        matcher = RuleBasedIdentityMatcher(cache=cold)
+        candidate_pairs, _ = find_candidates(records, cache=cold)
+        end_to_end['pairs'] = len(candidate_pairs)
+        matcher.score_batch([(records[i], records[j]) for i, j in candidate_pairs])
+    _timed(results, 'end_to_end_rule', n_records, run_end_to_end, repeats)
+    results['end_to_end_rule']['pairs'] = end_to_end['pairs']
+    results['end_to_end_rule']['pairs_per_second'] = round(end_to_end['pairs'] / results['end_to_end_rule']['seconds'], 1)
+
+    return {
+        'n_records': n_records,
+        'blocking_stats': blocking['stats'].dict(),
+        'normalization_cache': cache.stats().dict(),
+        'timings': results
+    }
+
+def _legacy_standardize(address: str, abbreviations: dict) -> str:
+    """One regex substitution per table entry (the previous implementation), for comparison"""
+    address_lower = address.lower()
+    for abbr, full in abbreviations.items():
+        address_lower = re.sub(r'\b' + abbr + r'\b', full, address_lower)
+    return address_lower
+
+def benchmark_abbreviation_tables(n_addresses: int = 2000, seed: int = 42,
+                                  table_sizes: List[int] = None) -> dict:
+    """Per-address standardization cost as the abbreviation table grows (padded with synthetic entries)"""
+    records, _ = generate_records(n_addresses, seed=seed)
+    addresses = [record.address for record in records]
+    results: Dict[str, dict] = {}
+
+    for table_size in table_sizes or ABBREVIATION_TABLE_SIZES:
+        table = dict(settings.ADDRESS_ABBREVIATIONS)
+        for k in range(len(table), table_size):
+            table[f"sfx{k}"] = f"suffix{k}"
+        standardizer = AbbreviationStandardizer(table)
+        _timed(results, f'standardize_{table_size}_entries', n_addresses,
+               lambda: [standardizer.standardize(address) for address in addresses])
+        # The legacy loop falls out of re's pattern cache past ~500 entries, so it gets a small sample
+        legacy_sample = addresses[:LEGACY_ABBREVIATION_SAMPLE]
+        _timed(results, f'legacy_standardize_{table_size}_entries', len(legacy_sample),
+               lambda: [_legacy_standardize(address, table) for address in legacy_sample])
+
+    return {'n_addresses': n_addresses, 'timings': results}
+
+def benchmark_fuzzy_index(n_records: int, seed: int = 42, k: int = None, n_queries: int = 1000,
+                          typo_rate: float = 0.5) -> dict:
+    """
+    MinHash/LSH index build time, size and top-k query latency, plus the recall of
+    typo duplicates for exact-key blocking alone vs with fuzzy neighbours added.
+    """
+    k = k or settings.FUZZY_TOP_K
+    results: Dict[str, dict] = {}
+    records, true_pairs = generate_records(n_records, seed=seed, typo_rate=typo_rate)
+    cache = NormalizationCache(maxsize=n_records)
+    for record in records:
+        cache.get(record)
+
+    fuzzy_index = MinHashLSHIndex(cache=cache)
+    blocking_index = BlockingIndex(cache=cache)
+    _timed(results, 'fuzzy_index_build', n_records, lambda: fuzzy_index.add_all(records))
+    blocking_index.add_all(records)
+
+    # Each sampled duplicate queries the records indexed before it, as in incremental matching
+    sample = true_pairs[:n_queries]
+    found = {}
+    def run_queries():
+        for i, j in sample:
+            found[(i, j)] = any(neighbour == i for neighbour, _ in fuzzy_index.neighbours(j, k))
+    _timed(results, 'fuzzy_query_top_k', len(sample), run_queries)
+
+    def shares_key(i: int, j: int) -> bool:
+        keys_i, keys_j = blocking_index.blocking_keys(records[i]), blocking_index.blocking_keys(records[j])
+        return any(keys_i.get(key_type) == key for key_type, key in keys_j.items())
+
+    exact = sum(shares_key(i, j) for i, j in sample)
+    combined = sum(shares_key(i, j) or found[(i, j)] for i, j in sample)
+    return {
+        'n_records': n_records,
+        'k': k,
+        'typo_rate': typo_rate,
+        'index': fuzzy_index.stats().dict(),
+        'recall_exact_blocking': exact / len(sample) if sample else None,
+        'recall_with_fuzzy': combined / len(sample) if sample else None,
+        'timings': results
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def run_benchmarks(sizes: List[str], seed: int = 42, pair_sample: int = 20000, model_path: Optional[str] = None,
+                   training_samples: int = 5000, repeats: int = DEFAULT_REPEATS) -> dict:
+    """Run every size and build the JSON report"""
+    ml_matcher = _train_model(model_path, training_samples)
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'pair_sample': pair_sample,
+        'repeats': repeats,
+        'model': model_path or f"trained:{training_samples}",
+        'sizes': {},
+        'fuzzy_index': {}
+    }
+    for size in sizes:
+        logger.info(f"Benchmarking {size} records...")
+        report['sizes'][size] = benchmark_size(SIZES[size], ml_matcher, pair_sample, seed, repeats=repeats)
+        report['fuzzy_index'][size] = benchmark_fuzzy_index(SIZES[size], seed=seed)
+    report['abbreviation_tables'] = benchmark_abbreviation_tables(seed=seed)
+    return report
+
+def _sections(report: dict) -> Dict[str, dict]:
+    """Timing tables of a report keyed by section label"""
+    sections = {size: data['timings'] for size, data in report.get('sizes', {}).items()}
+    for size, data in report.get('fuzzy_index', {}).items():
+        sections[f'fuzzy_index_{size}'] = data['timings']
+    if 'abbreviation_tables' in report:
+        sections['abbreviation_tables'] = report['abbreviation_tables']['timings']
+    return sections
+
+def compare_reports(baseline_path: str, current_path: str):
+    """Print per-metric us/op for two reports and the speedup of current over baseline"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    print(f"baseline {baseline.get('commit')}  vs  current {current.get('commit')}")
+    baseline_sections = _sections(baseline)
+    for label, timings in _sections(current).items():
+        if label not in baseline_sections:
+            continue
+        print(f"\n[{label}]")
+        print(f"{'metric':36} {'baseline us/op':>16} {'current us/op':>16} {'speedup':>9}")
+        base_timings = baseline_sections[label]
+        for name, timing in timings.items():
+            if name not in base_timings:
+                continue
+            before, after = base_timings[name]['us_per_op'], timing['us_per_op']
+            speedup = before / after if after else float('inf')
+            print(f"{name:36} {before:16.3f} {after:16.3f} {speedup:8.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description='Identity matching benchmark suite')
+    parser.add_argument('--sizes', type=str, default='1k,100k', help=f"Comma separated sizes from {list(SIZES)}")
+    parser.add_argument('--seed', type=int, default=42, help='Seed for synthetic record generation')
+    parser.add_argument('--pair-sample', type=int, default=20000, help='Candidate pairs used for per-comparator timings')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help='Timed runs per metric after one warmup run; the median is reported')
+    parser.add_argument('--model', type=str, help='Saved model to benchmark (default: train a small one)')
+    parser.add_argument('--output', type=str, default='benchmark_report.json', help='JSON report path')
+    parser.add_argument('--profile', type=str, help='Write a cProfile capture (.prof) of the whole run')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='Compare two JSON reports')
+    parser.add_argument('--keep-logs', action='store_true', help='Keep per-record warning logs (they distort timings)')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    if not args.keep_logs:
+        # Parse-failure warnings are logged per record; only report progress
+        logger.remove()
+        logger.add(sys.stderr, level="INFO", filter=lambda record: record["name"] == __name__)
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"Unknown sizes {unknown}; choose from {list(SIZES)}")
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    report = run_benchmarks(sizes, seed=args.seed, pair_sample=args.pair_sample, model_path=args.model,
+                            repeats=args.repeats)
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+        logger.info(f"Profile written to {args.profile} (render with snakeviz or flameprof)")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
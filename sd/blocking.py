@@ -0,0 +1,222 @@
+import re
+from collections import defaultdict
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+from config import settings
+from loguru import logger
+from models import IdentityRecord, SimilarityResult, BlockingStats
+from normalization import NormalizationCache, normalization_cache
+from fuzzy_index import MinHashLSHIndex
+from rule_based_matcher import RuleBasedIdentityMatcher
+
+Pair = Tuple[int, int]
+
+def _as_record(record: Union[IdentityRecord, dict]) -> IdentityRecord:
+    """Accept either an IdentityRecord or a raw dict"""
+    if isinstance(record, IdentityRecord):
+        return record
+    return IdentityRecord(**record)
+
+class BlockingIndex:
+    """
+    Inverted indexes over normalized record keys.
+    Only records sharing at least one key are ever compared.
+    An optional MinHash/LSH index adds each record's top-k fuzzy neighbours
+    (typo variants that share no exact key).
+    """
+    KEY_TYPES = ('phone', 'email', 'name', 'alias', 'address')
+
+    def __init__(self, max_block_size: int = None, phone_suffix_length: int = None, cache: NormalizationCache = None,
+                 fuzzy_index: Optional[MinHashLSHIndex] = None, fuzzy_k: int = None):
+        self.max_block_size = max_block_size or settings.BLOCKING_MAX_BLOCK_SIZE
+        self.phone_suffix_length = phone_suffix_length or settings.BLOCKING_PHONE_SUFFIX_LENGTH
+        self.cache = cache if cache is not None else normalization_cache
+        self.fuzzy_index = fuzzy_index
+        self.fuzzy_k = fuzzy_k or settings.FUZZY_TOP_K
+        self.records: List[IdentityRecord] = []
+        self.index: Dict[str, Dict[str, List[int]]] = {key_type: defaultdict(list) for key_type in self.KEY_TYPES}
+
+    def __getstate__(self):
+        # The normalization cache is process-local and is not persisted
+        state = self.__dict__.copy()
+        del state['cache']
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('fuzzy_index', None)
+        state.setdefault('fuzzy_k', settings.FUZZY_TOP_K)
+        for key_type in self.KEY_TYPES:
+            state['index'].setdefault(key_type, defaultdict(list))
+        self.__dict__.update(state)
+        self.cache = normalization_cache
+
+    def set_fuzzy_k(self, fuzzy_k: int):
+        """
+        Change the fuzzy neighbour count of an existing (e.g. loaded) index.
+        Enabling it on an index built without one indexes the stored records first;
+        0 drops the fuzzy index.
+        """
+        if not fuzzy_k:
+            self.fuzzy_index = None
+            return
+        if self.fuzzy_index is None:
+            self.fuzzy_index = MinHashLSHIndex(cache=self.cache)
+            self.fuzzy_index.add_all(self.records)
+        self.fuzzy_k = fuzzy_k
+
+    def blocking_keys(self, record: IdentityRecord) -> Dict[str, str]:
+        """Compute the normalized blocking key for each field (empty keys are dropped)"""
+        keys = {}
+        normalized = self.cache.get(record)
+
+        if normalized.phone:
+            digits = re.sub(r'\D', '', normalized.phone_e164)
+            if len(digits) >= self.phone_suffix_length:
+                keys['phone'] = digits[-self.phone_suffix_length:]
+
+        if normalized.email_username:
+            keys['email'] = normalized.email_username
+
+        if normalized.name_soundex:
+            keys['name'] = normalized.name_soundex
+
+        # Given names mapped to their canonical form, so 'bob smith' meets 'robert smith'
+        if normalized.name_canonical:
+            keys['alias'] = normalized.name_canonical
+
+        if normalized.address:
+            parsed = normalized.address_parsed
+            number = parsed.get('AddressNumber', '').lower()
+            street = parsed.get('StreetName', '').lower()
+            if number and street:
+                keys['address'] = f"{number}|{street}"
+
+        return keys
+
+    def add(self, record: Union[IdentityRecord, dict]) -> int:
+        """Add a record to the index and return its position"""
+        record = _as_record(record)
+        position = len(self.records)
+        self.records.append(record)
+        for key_type, key in self.blocking_keys(record).items():
+            self.index[key_type][key].append(position)
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.add(record)
+        return position
+
+    def add_and_query(self, record: Union[IdentityRecord, dict]) -> Tuple[int, Set[int]]:
+        """
+        Find already-indexed records sharing a key with this one, then index it.
+        Used for streaming/incremental matching: each new record is only compared to earlier ones.
+        """
+        record = _as_record(record)
+        position = len(self.records)
+        candidates: Set[int] = set()
+        for key_type, key in self.blocking_keys(record).items():
+            block = self.index[key_type][key]
+            if len(block) < self.max_block_size:
+                candidates.update(block)
+            block.append(position)
+        if self.fuzzy_index is not None:
+            _, neighbours = self.fuzzy_index.add_and_query(record, self.fuzzy_k)
+            candidates.update(neighbour for neighbour, _ in neighbours)
+        self.records.append(record)
+        return position, candidates
+
+    def add_all(self, records: Iterable[Union[IdentityRecord, dict]]):
+        """Add many records to the index"""
+        for record in records:
+            self.add(record)
+
+    def candidate_pairs(self) -> Tuple[Set[Pair], Dict[str, int], int]:
+        """
+        Generate deduplicated candidate pairs from every block.
+        Returns (pairs, pairs contributed per key type, number of skipped oversized blocks)
+        """
+        pairs: Set[Pair] = set()
+        block_counts = {key_type: 0 for key_type in self.KEY_TYPES}
+        skipped_blocks = 0
+
+        for key_type, blocks in self.index.items():
+            for key, positions in blocks.items():
+                if len(positions) < 2:
+                    continue
+                if len(positions) > self.max_block_size:
+                    # Very common keys (e.g. a popular soundex) explode quadratically
+                    logger.debug(f"Skipping oversized {key_type} block '{key}' ({len(positions)} records)")
+                    skipped_blocks += 1
+                    continue
+                before = len(pairs)
+                pairs.update(combinations(positions, 2))
+                block_counts[key_type] += len(pairs) - before
+
+        if self.fuzzy_index is not None:
+            before = len(pairs)
+            pairs.update(self.fuzzy_index.candidate_pairs(self.fuzzy_k))
+            block_counts['fuzzy'] = len(pairs) - before
+
+        return pairs, block_counts, skipped_blocks
+
+def _compute_stats(n_records: int, pairs: Set[Pair], block_counts: Dict[str, int], skipped_blocks: int,
+                   true_pairs: Optional[Iterable[Pair]] = None) -> BlockingStats:
+    """Summarize how much work blocking saved and how many true matches it kept"""
+    total_possible = n_records * (n_records - 1) // 2
+    reduction_ratio = 1.0 - (len(pairs) / total_possible) if total_possible else 0.0
+
+    pair_completeness = None
+    if true_pairs is not None:
+        true_set = {(min(i, j), max(i, j)) for i, j in true_pairs}
+        if true_set:
+            pair_completeness = len(true_set & pairs) / len(true_set)
+
+    return BlockingStats(
+        n_records=n_records,
+        pairs_generated=len(pairs),
+        total_possible_pairs=total_possible,
+        reduction_ratio=reduction_ratio,
+        pair_completeness=pair_completeness,
+        block_counts=block_counts,
+        skipped_blocks=skipped_blocks
+    )
+
+def find_candidates(records: Iterable[Union[IdentityRecord, dict]], true_pairs: Optional[Iterable[Pair]] = None,
+                    max_block_size: int = None, fuzzy_k: int = 0,
+                    cache: NormalizationCache = None) -> Tuple[List[Pair], BlockingStats]:
+    """
+    Build the blocking index over records and return sorted candidate pairs (i < j)
+    together with pairs-generated / pair-completeness stats.
+    With fuzzy_k > 0, each record's top-k MinHash/LSH neighbours are added as candidates.
+    `cache` defaults to the shared process-wide normalization cache.
+    """
+    fuzzy_index = MinHashLSHIndex(cache=cache) if fuzzy_k else None
+    index = BlockingIndex(max_block_size=max_block_size, cache=cache, fuzzy_index=fuzzy_index, fuzzy_k=fuzzy_k)
+    index.add_all(records)
+
+    pairs, block_counts, skipped_blocks = index.candidate_pairs()
+    stats = _compute_stats(len(index.records), pairs, block_counts, skipped_blocks, true_pairs)
+
+    logger.info(f"Blocking generated {stats.pairs_generated} candidate pairs for {stats.n_records} records "
+                f"(reduction ratio {stats.reduction_ratio:.4f})")
+    return sorted(pairs), stats
+
+def match_all(records: Iterable[Union[IdentityRecord, dict]], matcher=None, true_pairs: Optional[Iterable[Pair]] = None,
+              only_matches: bool = False, max_block_size: int = None,
+              fuzzy_k: int = 0) -> Tuple[List[Tuple[int, int, SimilarityResult]], BlockingStats]:
+    """
+    Score only the candidate pairs produced by blocking.
+    `matcher` is any object with compute_similarity(record1, record2); defaults to RuleBasedIdentityMatcher.
+    """
+    if matcher is None:
+        matcher = RuleBasedIdentityMatcher()
+
+    records = [_as_record(record) for record in records]
+    pairs, stats = find_candidates(records, true_pairs=true_pairs, max_block_size=max_block_size, fuzzy_k=fuzzy_k)
+
+    results = []
+    for i, j in pairs:
+        result = matcher.compute_similarity(records[i], records[j])
+        if only_matches and not result.is_same_person:
+            continue
+        results.append((i, j, result))
+
+    return results, stats
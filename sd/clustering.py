@@ -0,0 +1,172 @@
+import time
+from array import array
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import joblib
+from blocking import BlockingIndex
+from rule_based_matcher import RuleBasedIdentityMatcher
+from config import settings
+from loguru import logger
+from models import IdentityRecord, CompactResult, ClusterUpdateStats
+
+class UnionFind:
+    """
+    Compact array-backed union-find (int32 parent/size arrays) with path compression
+    and union by size. Each root also carries a stable entity id: when two clusters
+    merge, the older (smaller) entity id survives.
+    """
+
+    def __init__(self):
+        self.parent = array('i')
+        self.size = array('i')
+        self.entity = array('i')
+        self.n_sets = 0
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self) -> int:
+        """Add a singleton element and return its position (also its entity id)"""
+        position = len(self.parent)
+        self.parent.append(position)
+        self.size.append(1)
+        self.entity.append(position)
+        self.n_sets += 1
+        return position
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        """Merge the sets of x and y; returns (absorbed entity id, surviving entity id) if they were distinct"""
+        root_x, root_y = self.find(x), self.find(y)
+        if root_x == root_y:
+            return None
+        if self.size[root_x] < self.size[root_y]:
+            root_x, root_y = root_y, root_x
+        self.parent[root_y] = root_x
+        self.size[root_x] += self.size[root_y]
+        self.n_sets -= 1
+
+        surviving = min(self.entity[root_x], self.entity[root_y])
+        absorbed = max(self.entity[root_x], self.entity[root_y])
+        self.entity[root_x] = surviving
+        return absorbed, surviving
+
+    def entity_of(self, x: int) -> int:
+        return self.entity[self.find(x)]
+
+class EntityClusterer:
+    """
+    Turns pairwise match decisions into stable entity ids.
+    Records are inserted incrementally: each new record is blocked and scored only
+    against records already in the index, so a delta never re-clusters the base.
+    """
+
+    def __init__(self, matcher=None, index: BlockingIndex = None):
+        self.matcher = matcher or RuleBasedIdentityMatcher()
+        self.index = index or BlockingIndex()
+        self.clusters = UnionFind()
+        self.record_ids: List[str] = []
+
+    def __getstate__(self):
+        # The matcher (and any loaded model) is supplied again on load
+        state = self.__dict__.copy()
+        state['matcher'] = None
+        return state
+
+    def add_records(self, records: Iterable[Tuple[str, IdentityRecord]], batch_size: int = None,
+                    on_scored: Callable[[str, str, CompactResult], None] = None,
+                    progress_every: int = None) -> ClusterUpdateStats:
+        """
+        Insert (record_id, record) tuples. Candidate pairs are scored in batches with the
+        matcher's score_batch; `on_scored` receives every scored pair as it is produced.
+        """
+        batch_size = batch_size or settings.DEDUP_BATCH_SIZE
+        progress_every = progress_every or settings.DEDUP_PROGRESS_EVERY
+
+        pending: List[Tuple[int, int]] = []
+        first_position = len(self.record_ids)
+        n_pairs = 0
+        n_matches = 0
+        n_merges = 0
+        start_time = time.time()
+        last_report = start_time
+
+        def flush():
+            nonlocal n_pairs, n_matches, n_merges
+            if not pending:
+                return
+            results = self.matcher.score_batch([(self.index.records[i], self.index.records[j]) for i, j in pending])
+            for k, (i, j) in enumerate(pending):
+                result = results[k]
+                if on_scored is not None:
+                    on_scored(self.record_ids[i], self.record_ids[j], result)
+                if result.is_same_person:
+                    n_matches += 1
+                    merge = self.clusters.union(i, j)
+                    # Count entities from before this insertion that were absorbed into another
+                    if merge is not None and merge[0] < first_position:
+                        n_merges += 1
+            n_pairs += len(pending)
+            pending.clear()
+
+        n_added = 0
+        for record_id, record in records:
+            position, candidates = self.index.add_and_query(record)
+            self.clusters.add()
+            self.record_ids.append(record_id)
+            pending.extend((candidate, position) for candidate in sorted(candidates))
+            n_added += 1
+
+            if len(pending) >= batch_size:
+                flush()
+
+            if n_added % progress_every == 0:
+                now = time.time()
+                logger.info(f"{n_added} records added, {n_pairs} pairs scored, {n_matches} matches "
+                            f"({n_added / (now - start_time):.0f} records/s overall, "
+                            f"{progress_every / (now - last_report):.0f} records/s recent)")
+                last_report = now
+
+        flush()
+
+        elapsed = time.time() - start_time
+        return ClusterUpdateStats(
+            records_added=n_added,
+            total_records=len(self.record_ids),
+            candidate_pairs=n_pairs,
+            matched_pairs=n_matches,
+            entity_merges=n_merges,
+            entities=self.clusters.n_sets,
+            elapsed_seconds=elapsed,
+            records_per_second=n_added / elapsed if elapsed else 0.0,
+            pairs_per_second=n_pairs / elapsed if elapsed else 0.0
+        )
+
+    def entity_id(self, position: int) -> str:
+        """Stable entity id of a record: the id of the oldest record in its cluster"""
+        return self.record_ids[self.clusters.entity_of(position)]
+
+    def assignments(self, start: int = 0) -> Iterator[Tuple[str, str]]:
+        """(record_id, entity_id) for every record from position `start` onwards"""
+        for position in range(start, len(self.record_ids)):
+            yield self.record_ids[position], self.entity_id(position)
+
+    def save(self, filepath: str):
+        """Persist blocking index, union-find arrays and record ids"""
+        joblib.dump(self, filepath)
+        logger.info(f"Cluster index with {len(self.record_ids)} records saved to {filepath}")
+
+    @classmethod
+    def load(cls, filepath: str, matcher=None) -> "EntityClusterer":
+        """Load a saved cluster index; the matcher is not persisted"""
+        clusterer = joblib.load(filepath)
+        clusterer.matcher = matcher or RuleBasedIdentityMatcher()
+        logger.info(f"Cluster index with {len(clusterer.record_ids)} records loaded from {filepath}")
+        return clusterer
@@ -0,0 +1,207 @@
+import json
+import os
+from typing import List, Optional, Tuple
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from loguru import logger
+
+FORMAT_VERSION = 1
+
+# Node columns, stored back to back in one flat byte buffer (8-byte columns first to keep alignment).
+# Leaves point to themselves with feature 0 and an infinite threshold, so traversal needs no leaf test.
+NODE_COLUMNS = [
+    ('threshold', np.float64, 1),
+    ('value', np.float64, 1),
+    ('feature', np.int32, 1),
+    ('children', np.int32, 2),
+]
+
+def _paths(path: str) -> Tuple[str, str]:
+    """A compiled model is `<path>.npy` (node buffer) plus `<path>.json` (metadata)"""
+    base = path[:-4] if path.endswith('.npy') else path
+    return base + '.npy', base + '.json'
+
+class CompiledScaler:
+    """StandardScaler.transform from stored mean/scale"""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X)
+        dtype = X.dtype if X.dtype in (np.float32, np.float64) else np.float64
+        # In-place like sklearn, so float32 input rounds the same way
+        X_scaled = np.array(X, dtype=dtype)
+        X_scaled -= self.mean_
+        X_scaled /= self.scale_
+        return X_scaled
+
+class CompiledForest:
+    """
+    Pure-NumPy random forest predictor over flat node arrays.
+    All trees are evaluated at once: every step advances each (sample, tree) cursor
+    one level, so the Python loop runs max_depth times regardless of tree count.
+    """
+
+    def __init__(self, columns: dict, roots: np.ndarray, max_depth: int, scaler: CompiledScaler,
+                 feature_names: Optional[List[str]] = None, chunk_size: int = 10000):
+        self.threshold = columns['threshold']
+        self.value = columns['value']
+        self.feature = columns['feature']
+        self.children = columns['children']
+        self.roots = roots
+        self.max_depth = max_depth
+        self.scaler = scaler
+        self.feature_names = feature_names
+        self.chunk_size = chunk_size
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.threshold)
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_samples, n_features = X.shape
+        X_flat = X.ravel()
+        row_offsets = (np.arange(n_samples, dtype=np.int64) * n_features)[:, None]
+        cursor = np.broadcast_to(self.roots, (n_samples, self.n_trees)).copy()
+
+        for _ in range(self.max_depth):
+            go_right = X_flat[row_offsets + self.feature[cursor]] > self.threshold[cursor]
+            cursor = self.children[cursor * 2 + go_right]
+
+        return self.value[cursor].mean(axis=1)
+
+    def predict_match_proba(self, X_scaled: np.ndarray) -> np.ndarray:
+        """Probability of the match class for already-scaled features"""
+        # sklearn evaluates trees on float32 input; match that for identical split decisions
+        X_scaled = np.ascontiguousarray(X_scaled, dtype=np.float32)
+        probabilities = np.empty(len(X_scaled), dtype=np.float64)
+        for start in range(0, len(X_scaled), self.chunk_size):
+            probabilities[start:start + self.chunk_size] = self._predict_chunk(X_scaled[start:start + self.chunk_size])
+        return probabilities
+
+    def predict_proba(self, X_scaled: np.ndarray) -> np.ndarray:
+        """sklearn-compatible (n_samples, 2) output, so MLIdentityMatcher can use this as its model"""
+        match = self.predict_match_proba(X_scaled)
+        return np.column_stack([1.0 - match, match])
+
+    def to_buffer(self) -> np.ndarray:
+        """All node columns as one contiguous uint8 buffer"""
+        return np.concatenate([
+            np.ascontiguousarray(getattr(self, name), dtype=dtype).view(np.uint8).ravel()
+            for name, dtype, _ in NODE_COLUMNS
+        ])
+
+    @staticmethod
+    def columns_from_buffer(buffer: np.ndarray, n_nodes: int) -> dict:
+        """Zero-copy column views into a (possibly memory-mapped) uint8 buffer"""
+        columns = {}
+        offset = 0
+        for name, dtype, width in NODE_COLUMNS:
+            size = np.dtype(dtype).itemsize * width * n_nodes
+            columns[name] = buffer[offset:offset + size].view(dtype)
+            offset += size
+        return columns
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompiledForest":
+        """Load a compiled model; with mmap the node pages are shared between processes via the page cache"""
+        nodes_path, meta_path = _paths(path)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format {meta['format_version']}")
+
+        buffer = np.load(nodes_path, mmap_mode='r' if mmap else None)
+        columns = cls.columns_from_buffer(buffer, meta['n_nodes'])
+        scaler = CompiledScaler(np.array(meta['scaler_mean']), np.array(meta['scaler_scale']))
+        logger.info(f"Compiled model with {len(meta['roots'])} trees loaded from {nodes_path}")
+        return cls(columns, np.array(meta['roots'], dtype=np.int64), meta['max_depth'], scaler, meta.get('feature_names'))
+
+def compile_forest(model: RandomForestClassifier, scaler: StandardScaler,
+                   feature_names: Optional[List[str]] = None) -> CompiledForest:
+    """Flatten every tree of a fitted forest into one set of node columns"""
+    if not isinstance(model, RandomForestClassifier):
+        raise ValueError(f"Only RandomForestClassifier can be compiled, got {type(model).__name__}")
+
+    match_class = list(model.classes_).index(1)
+    n_nodes = sum(estimator.tree_.node_count for estimator in model.estimators_)
+    columns = {
+        'threshold': np.empty(n_nodes, dtype=np.float64),
+        'value': np.empty(n_nodes, dtype=np.float64),
+        'feature': np.empty(n_nodes, dtype=np.int32),
+        'children': np.empty(2 * n_nodes, dtype=np.int32),
+    }
+    roots = np.empty(len(model.estimators_), dtype=np.int64)
+    max_depth = 0
+
+    offset = 0
+    for t, estimator in enumerate(model.estimators_):
+        tree = estimator.tree_
+        count = tree.node_count
+        nodes = slice(offset, offset + count)
+        is_leaf = tree.children_left < 0
+        self_index = np.arange(offset, offset + count)
+        values = tree.value[:, 0, :]
+
+        columns['threshold'][nodes] = np.where(is_leaf, np.inf, tree.threshold)
+        columns['value'][nodes] = values[:, match_class] / values.sum(axis=1)
+        columns['feature'][nodes] = np.where(is_leaf, 0, tree.feature)
+        columns['children'][2 * offset:2 * (offset + count):2] = np.where(is_leaf, self_index, tree.children_left + offset)
+        columns['children'][2 * offset + 1:2 * (offset + count):2] = np.where(is_leaf, self_index, tree.children_right + offset)
+
+        roots[t] = offset
+        max_depth = max(max_depth, tree.max_depth)
+        offset += count
+
+    return CompiledForest(columns, roots, max_depth, CompiledScaler(scaler.mean_, scaler.scale_), feature_names)
+
+def check_parity(model: RandomForestClassifier, scaler: StandardScaler, compiled: CompiledForest,
+                 X: np.ndarray) -> float:
+    """Max absolute difference between sklearn and compiled match probabilities on raw features X"""
+    expected = model.predict_proba(scaler.transform(X))[:, list(model.classes_).index(1)]
+    actual = compiled.predict_match_proba(compiled.scaler.transform(X))
+    return float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+
+def export_compiled_model(model: RandomForestClassifier, scaler: StandardScaler, path: str,
+                          feature_names: Optional[List[str]] = None, X_check: Optional[np.ndarray] = None,
+                          tolerance: float = 1e-9) -> float:
+    """
+    Compile the forest and scaler, verify probability parity against sklearn and write
+    `<path>.npy` (memory-mappable node buffer) and `<path>.json` (roots, scaler, metadata).
+    Returns the measured max probability difference.
+    """
+    compiled = compile_forest(model, scaler, feature_names)
+
+    if X_check is None:
+        # Features are similarity ratios and flags in [0, 1]
+        X_check = np.random.RandomState(0).uniform(0.0, 1.0, size=(2000, len(scaler.mean_)))
+    max_diff = check_parity(model, scaler, compiled, X_check)
+    if max_diff > tolerance:
+        raise ValueError(f"Compiled model disagrees with sklearn: max probability difference {max_diff}")
+
+    nodes_path, meta_path = _paths(path)
+    directory = os.path.dirname(nodes_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    np.save(nodes_path, compiled.to_buffer())
+    with open(meta_path, 'w') as f:
+        json.dump({
+            'format_version': FORMAT_VERSION,
+            'roots': compiled.roots.tolist(),
+            'max_depth': compiled.max_depth,
+            'scaler_mean': scaler.mean_.tolist(),
+            'scaler_scale': scaler.scale_.tolist(),
+            'feature_names': feature_names,
+            'n_nodes': compiled.n_nodes
+        }, f)
+
+    logger.info(f"Compiled {compiled.n_trees} trees ({compiled.n_nodes} nodes) to {nodes_path} "
+                f"(max probability difference vs sklearn: {max_diff:.2e})")
+    return max_diff
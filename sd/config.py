@@ -15,10 +15,49 @@ class Settings(BaseSettings):
         'address': 0.1
     }
     
+    # Bounded (early-exit) evaluation order, cheapest comparator first
+    FIELD_EVALUATION_ORDER: List[str] = ['phone', 'email', 'name', 'address']
+    
     # ML training parameters
     TRAINING_SAMPLES: int = 50000
     TEST_SIZE: float = 0.2
     RANDOM_STATE: int = 42
+    ML_BATCH_CHUNK_SIZE: int = 10000
+    MODEL_PATH: str = "models/identity_matcher_model.joblib"
+    
+    # Synthetic training data generation (0 jobs = one per CPU; empty SYNTHETIC_CACHE_DIR disables the .npy cache).
+    # Small shards keep every core busy (50k samples -> 200 shards); the output depends on the
+    # shard size but never on the number of jobs
+    SYNTHETIC_N_JOBS: int = 0
+    SYNTHETIC_SHARD_SIZE: int = 250
+    SYNTHETIC_CACHE_DIR: str = ""
+    
+    # Blocking / candidate generation settings
+    BLOCKING_PHONE_SUFFIX_LENGTH: int = 7
+    BLOCKING_MAX_BLOCK_SIZE: int = 1000
+    
+    # Fuzzy (MinHash/LSH) candidate search; candidate probability is 1 - (1 - s^rows)^bands
+    FUZZY_LSH_BANDS: int = 20
+    FUZZY_LSH_ROWS: int = 3
+    FUZZY_SHINGLE_SIZE: int = 2
+    FUZZY_MAX_BUCKET_SIZE: int = 500
+    FUZZY_TOP_K: int = 10
+    
+    # Streaming dedup settings
+    DEDUP_BATCH_SIZE: int = 10000
+    DEDUP_PROGRESS_EVERY: int = 100000
+    
+    # Process-pool scoring (0 workers = one per CPU)
+    PARALLEL_WORKERS: int = 0
+    PARALLEL_SHARD_SIZE: int = 5000
+    
+    # Per-record normalization cache
+    NORMALIZATION_CACHE_SIZE: int = 100000
+    
+    # Logging (empty LOG_FILE disables the file sink)
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: str = "logs/identity_matching.log"
+    LOG_FILE_LEVEL: str = "DEBUG"
     
     # Address parsing settings
     ADDRESS_ABBREVIATIONS: Dict[str, str] = {
@@ -26,6 +65,13 @@ class Settings(BaseSettings):
         'dr': 'drive', 'blvd': 'boulevard', 'ln': 'lane',
         'ct': 'court', 'pl': 'place', 'cir': 'circle'
     }
+    # Extra given-name aliases merged into the bundled data/name_aliases.csv, which only
+    # covers ~165 common English given names; point this at a full nickname corpus
+    # (CSV rows canonical,alias,... or JSON {canonical: [aliases]})
+    NAME_ALIASES_FILE: str = ""
+    
+    # Optional extra table (JSON {abbr: full} or CSV abbr,full), e.g. the USPS suffix list
+    ADDRESS_ABBREVIATIONS_FILE: str = ""
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,71 @@
+import os
+from typing import Optional
+from blocking import BlockingIndex
+from clustering import EntityClusterer
+from fuzzy_index import MinHashLSHIndex
+from record_io import RowWriter, read_records
+from rule_based_matcher import RuleBasedIdentityMatcher
+from mm import MLIdentityMatcher
+from config import settings
+from loguru import logger
+from models import IdentityRecord, ClusterUpdateStats
+
+PAIR_FIELDS = ['left_id', 'right_id', 'similarity_score', 'is_same_person', 'confidence']
+CLUSTER_FIELDS = ['record_id', 'entity_id']
+
+def _build_matcher(method: str, model_path: Optional[str]):
+    """Create the matcher used to score candidate pairs (never trains)"""
+    if method == 'rule':
+        return RuleBasedIdentityMatcher()
+    if method == 'ml':
+        matcher = MLIdentityMatcher()
+        matcher.load_model(model_path or settings.MODEL_PATH)
+        return matcher
+    raise ValueError(f"Unsupported dedup method: {method}")
+
+def run_dedup(input_path: str, pairs_out: str, clusters_out: Optional[str] = None, method: str = 'rule',
+              input_format: Optional[str] = None, model_path: Optional[str] = None,
+              cluster_index: Optional[str] = None, batch_size: int = None,
+              progress_every: int = None, fuzzy_k: Optional[int] = None) -> ClusterUpdateStats:
+    """
+    Stream records from a file through blocking and the matcher.
+    Each record is compared only with earlier records sharing a blocking key; scored pairs
+    are written out in batches as they are produced, so pairs are never held in memory.
+
+    If `cluster_index` points to a saved index, the input is inserted as a delta against it
+    and the updated index is saved back. Entity assignments are written for the input records.
+    With fuzzy_k > 0 each record is also compared with its top-k MinHash/LSH neighbours.
+    A loaded index keeps its saved fuzzy_k unless one is given, which then replaces it.
+    """
+    matcher = _build_matcher(method, model_path)
+    if cluster_index and os.path.exists(cluster_index):
+        clusterer = EntityClusterer.load(cluster_index, matcher=matcher)
+        index = clusterer.index
+        saved_k = index.fuzzy_k if index.fuzzy_index is not None else 0
+        if fuzzy_k is not None and fuzzy_k != saved_k:
+            logger.warning(f"Cluster index was saved with fuzzy_k={saved_k}; using fuzzy_k={fuzzy_k}")
+            index.set_fuzzy_k(fuzzy_k)
+    else:
+        fuzzy_index = MinHashLSHIndex() if fuzzy_k else None
+        clusterer = EntityClusterer(matcher=matcher, index=BlockingIndex(fuzzy_index=fuzzy_index, fuzzy_k=fuzzy_k))
+    first_position = len(clusterer.record_ids)
+
+    records = ((record_id, IdentityRecord(**row)) for record_id, row in read_records(input_path, fmt=input_format))
+
+    with RowWriter(pairs_out, PAIR_FIELDS) as writer:
+        def write_pair(left_id, right_id, result):
+            score, is_same, confidence = result
+            writer.write((left_id, right_id, round(score, 6), is_same, round(confidence, 6)))
+
+        stats = clusterer.add_records(records, batch_size=batch_size, on_scored=write_pair, progress_every=progress_every)
+
+    if clusters_out:
+        with RowWriter(clusters_out, CLUSTER_FIELDS) as writer:
+            for record_id, entity_id in clusterer.assignments(start=first_position):
+                writer.write((record_id, entity_id))
+
+    if cluster_index:
+        clusterer.save(cluster_index)
+
+    logger.info(f"Dedup completed: {stats}")
+    return stats
@@ -0,0 +1,198 @@
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import numpy as np
+from config import settings
+from loguru import logger
+from models import IdentityRecord, FuzzyIndexStats
+from normalization import NormalizationCache, NormalizedRecord, normalization_cache
+
+# Universal hash family ((a * x + b) mod P) & 0xffffffff with a Mersenne prime P;
+# a and b span [1, P) so the products wrap and each permutation is independent of shingle order
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+def shingles(text: str, size: int) -> Set[str]:
+    """Character n-grams of a string (the whole string if shorter than size)"""
+    text = text.replace(' ', '')
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+class MinHashLSHIndex:
+    """
+    MinHash/LSH index over character n-grams of normalized names, email usernames
+    and standardized addresses. Each field gets its own banded LSH tables; a query only
+    scores records sharing at least one band bucket, ranked by estimated Jaccard.
+
+    Recall is tuned with bands/rows: a pair with Jaccard s becomes a candidate with
+    probability 1 - (1 - s^rows)^bands (more bands or fewer rows = higher recall).
+    """
+    FIELDS = ('name', 'email', 'address')
+
+    def __init__(self, bands: int = None, rows: int = None, shingle_size: int = None,
+                 max_bucket_size: int = None, seed: int = 1, cache: NormalizationCache = None):
+        self.bands = bands or settings.FUZZY_LSH_BANDS
+        self.rows = rows or settings.FUZZY_LSH_ROWS
+        self.num_perm = self.bands * self.rows
+        self.shingle_size = shingle_size or settings.FUZZY_SHINGLE_SIZE
+        self.max_bucket_size = max_bucket_size or settings.FUZZY_MAX_BUCKET_SIZE
+        self.cache = cache if cache is not None else normalization_cache
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, np.iinfo(np.int64).max, size=(self.num_perm, 1), dtype=np.int64).astype(np.uint64) % _PRIME
+        self._b = rng.randint(0, np.iinfo(np.int64).max, size=(self.num_perm, 1), dtype=np.int64).astype(np.uint64) % _PRIME
+
+        self.n_records = 0
+        self.signatures = {field: np.zeros((1024, self.num_perm), dtype=np.uint32) for field in self.FIELDS}
+        self.present = {field: np.zeros(1024, dtype=bool) for field in self.FIELDS}
+        self.buckets: Dict[str, List[Dict[bytes, List[int]]]] = {
+            field: [defaultdict(list) for _ in range(self.bands)] for field in self.FIELDS
+        }
+
+    def __getstate__(self):
+        # The normalization cache is process-local and is not persisted
+        state = self.__dict__.copy()
+        del state['cache']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.cache = normalization_cache
+
+    def _field_texts(self, normalized: NormalizedRecord) -> Dict[str, str]:
+        return {
+            'name': normalized.name_norm,
+            'email': normalized.email_username,
+            'address': normalized.address_std
+        }
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of a string's n-grams (None for empty text)"""
+        grams = shingles(text, self.shingle_size)
+        if not grams:
+            return None
+        hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams))
+        with np.errstate(over='ignore'):
+            permuted = ((self._a * hashes + self._b) % _PRIME) & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _signatures(self, record: IdentityRecord) -> Dict[str, np.ndarray]:
+        normalized = self.cache.get(record)
+        signatures = {}
+        for field, text in self._field_texts(normalized).items():
+            signature = self.signature(text)
+            if signature is not None:
+                signatures[field] = signature
+        return signatures
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _grow(self):
+        for field in self.FIELDS:
+            capacity = len(self.present[field])
+            if self.n_records < capacity:
+                continue
+            signatures = np.zeros((capacity * 2, self.num_perm), dtype=np.uint32)
+            signatures[:capacity] = self.signatures[field]
+            present = np.zeros(capacity * 2, dtype=bool)
+            present[:capacity] = self.present[field]
+            self.signatures[field], self.present[field] = signatures, present
+
+    def _insert(self, signatures: Dict[str, np.ndarray]) -> int:
+        self._grow()
+        position = self.n_records
+        for field, signature in signatures.items():
+            self.signatures[field][position] = signature
+            self.present[field][position] = True
+            for band, key in enumerate(self._band_keys(signature)):
+                self.buckets[field][band][key].append(position)
+        self.n_records += 1
+        return position
+
+    def _query(self, signatures: Dict[str, np.ndarray], k: int, exclude: int = -1) -> List[Tuple[int, float]]:
+        candidates: Set[int] = set()
+        for field, signature in signatures.items():
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self.buckets[field][band].get(key)
+                if bucket and len(bucket) <= self.max_bucket_size:
+                    candidates.update(bucket)
+        candidates.discard(exclude)
+        if not candidates:
+            return []
+
+        positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        scores = np.zeros(len(positions))
+        for field, signature in signatures.items():
+            # Estimated Jaccard = fraction of equal MinHash values; averaged over the query's fields
+            agreement = (self.signatures[field][positions] == signature).mean(axis=1)
+            scores += np.where(self.present[field][positions], agreement, 0.0)
+        scores /= len(signatures)
+
+        if len(positions) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            positions, scores = positions[top], scores[top]
+        order = np.lexsort((positions, -scores))
+        return [(int(positions[i]), float(scores[i])) for i in order]
+
+    def add(self, record: IdentityRecord) -> int:
+        """Index a record and return its position"""
+        return self._insert(self._signatures(record))
+
+    def add_all(self, records: Iterable[IdentityRecord]):
+        """Index many records"""
+        for record in records:
+            self.add(record)
+
+    def query(self, record: IdentityRecord, k: int = None) -> List[Tuple[int, float]]:
+        """Top-k indexed (position, estimated similarity) for a record, best first"""
+        return self._query(self._signatures(record), k or settings.FUZZY_TOP_K)
+
+    def neighbours(self, position: int, k: int = None) -> List[Tuple[int, float]]:
+        """Top-k neighbours of an already indexed record"""
+        signatures = {
+            field: self.signatures[field][position]
+            for field in self.FIELDS if self.present[field][position]
+        }
+        return self._query(signatures, k or settings.FUZZY_TOP_K, exclude=position)
+
+    def add_and_query(self, record: IdentityRecord, k: int = None) -> Tuple[int, List[Tuple[int, float]]]:
+        """Top-k among already indexed records, then index this one (incremental matching)"""
+        signatures = self._signatures(record)
+        neighbours = self._query(signatures, k or settings.FUZZY_TOP_K)
+        return self._insert(signatures), neighbours
+
+    def candidate_pairs(self, k: int = None) -> Set[Tuple[int, int]]:
+        """(i, j) pairs with i < j linking every record to its top-k neighbours"""
+        pairs: Set[Tuple[int, int]] = set()
+        for position in range(self.n_records):
+            for neighbour, _ in self.neighbours(position, k):
+                pairs.add((min(position, neighbour), max(position, neighbour)))
+        return pairs
+
+    def stats(self) -> FuzzyIndexStats:
+        """Index dimensions and memory footprint"""
+        n_buckets = sum(len(table) for tables in self.buckets.values() for table in tables)
+        bucket_entries = sum(len(bucket) for tables in self.buckets.values() for table in tables for bucket in table.values())
+        signature_bytes = sum(self.signatures[field][:self.n_records].nbytes for field in self.FIELDS)
+        return FuzzyIndexStats(
+            n_records=self.n_records,
+            num_perm=self.num_perm,
+            bands=self.bands,
+            rows=self.rows,
+            n_buckets=n_buckets,
+            bucket_entries=bucket_entries,
+            signature_bytes=signature_bytes,
+            # Key bytes (rows * 4) per bucket plus one int per entry, ignoring dict/list overhead
+            approx_bucket_bytes=n_buckets * self.rows * 4 + bucket_entries * 8
+        )
+
+def fuzzy_candidates(records: Iterable[Union[IdentityRecord, dict]], k: int = None,
+                     index: MinHashLSHIndex = None) -> Tuple[List[Tuple[int, int]], MinHashLSHIndex]:
+    """Index records and return sorted top-k fuzzy candidate pairs (i < j) with the index"""
+    index = index or MinHashLSHIndex()
+    index.add_all(record if isinstance(record, IdentityRecord) else IdentityRecord(**record) for record in records)
+    pairs = index.candidate_pairs(k)
+    logger.info(f"Fuzzy index generated {len(pairs)} candidate pairs for {index.n_records} records")
+    return sorted(pairs), index
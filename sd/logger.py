@@ -1,6 +1,7 @@
 
 from loguru import logger
 import sys
+from config import settings
 
 # Remove default logger
 logger.remove()
@@ -9,16 +10,17 @@ logger.remove()
 logger.add(
     sys.stderr,
     format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
-    level="INFO"
+    level=settings.LOG_LEVEL
 )
 
-# Add file logger
-logger.add(
-    "logs/identity_matching.log",
-    rotation="500 MB",
-    retention="10 days",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
-    level="DEBUG"
-)
+# Add file logger (every parse failure is logged at DEBUG, so disable it for hot runs)
+if settings.LOG_FILE:
+    logger.add(
+        settings.LOG_FILE,
+        rotation="500 MB",
+        retention="10 days",
+        format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
+        level=settings.LOG_FILE_LEVEL
+    )
 
 __all__ = ["logger"]
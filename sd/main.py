@@ -1,12 +1,23 @@
 
-from rule_based_matcher import RuleBasedIdentityMatcher
-from ml_matcher import MLIdentityMatcher
-from models import IdentityRecord, SimilarityResult
+from mm import MLIdentityMatcher
+from models import IdentityRecord
+from service import MatchingService, serve_jsonl
+from dedup import run_dedup
 from config import settings
 from loguru import logger
 import argparse
 import json
 
+_service = None
+
+def get_service() -> MatchingService:
+    """Matchers and model are created once per process and reused"""
+    global _service
+    if _service is None:
+        # The CLI keeps its demo behaviour of training a quick model if none is saved
+        _service = MatchingService(train_if_missing=True)
+    return _service
+
 def compare_records(record1_data: dict, record2_data: dict) -> dict:
     """Compare two records using both approaches"""
     
@@ -14,42 +25,7 @@ def compare_records(record1_data: dict, record2_data: dict) -> dict:
     record1 = IdentityRecord(**record1_data)
     record2 = IdentityRecord(**record2_data)
     
-    # Rule-based approach
-    rule_matcher = RuleBasedIdentityMatcher()
-    rule_result = rule_matcher.compute_similarity(record1, record2)
-    
-    # ML-based approach
-    ml_matcher = MLIdentityMatcher()
-    try:
-        # Try to load pre-trained model
-        ml_matcher.load_model("models/identity_matcher_model.joblib")
-    except FileNotFoundError:
-        logger.warning("No pre-trained model found. Training new model...")
-        ml_matcher.train(n_samples=1000)  # Quick training for demo
-        # In production, you'd want to save the model after training
-    
-    try:
-        ml_similarity = ml_matcher.predict_similarity(record1, record2)
-        ml_result = SimilarityResult(
-            similarity_score=ml_similarity,
-            is_same_person=ml_similarity >= settings.ML_THRESHOLD,
-            method="ml_based",
-            confidence=ml_similarity  # For ML, confidence is the probability
-        )
-    except Exception as e:
-        logger.error(f"ML prediction failed: {e}")
-        ml_result = SimilarityResult(
-            similarity_score=0.0,
-            is_same_person=False,
-            method="ml_based",
-            confidence=0.0,
-            details={'error': str(e)}
-        )
-    
-    return {
-        'rule_based': rule_result.dict(),
-        'ml_based': ml_result.dict()
-    }
+    return get_service().compare(record1, record2)
 
 def main():
     """Main entry point"""
@@ -58,19 +34,47 @@ def main():
     parser.add_argument('--record2', type=str, help='Second record JSON')
     parser.add_argument('--train', action='store_true', help='Train ML model')
     parser.add_argument('--save-model', type=str, help='Save trained model to file')
+    parser.add_argument('--synthetic-cache-dir', type=str, help='Cache synthetic training features as .npy in this directory for --train')
+    parser.add_argument('--serve', action='store_true', help='Serve JSON-lines requests on stdin/stdout')
+    parser.add_argument('--model', type=str, help='Model path for --serve / --dedup --method ml (default: settings.MODEL_PATH)')
+    parser.add_argument('--dedup', type=str, metavar='INPUT', help='Deduplicate a CSV, JSON-lines or Parquet file')
+    parser.add_argument('--input-format', choices=['csv', 'jsonl', 'parquet'], help='Input format for --dedup (default: from extension)')
+    parser.add_argument('--pairs-out', type=str, default='pairs.csv', help='Scored pairs output for --dedup (.csv or .jsonl)')
+    parser.add_argument('--clusters-out', type=str, help='Entity clusters output for --dedup (.csv or .jsonl)')
+    parser.add_argument('--method', choices=['rule', 'ml'], default='rule', help='Matcher used by --dedup')
+    parser.add_argument('--cluster-index', type=str, help='Saved cluster index: --dedup input is added as a delta and the index saved back')
+    parser.add_argument('--fuzzy-k', type=int, help='Also compare each record with its top-k MinHash/LSH neighbours in --dedup '
+                                                    '(default: off, or the value saved in --cluster-index)')
     
     args = parser.parse_args()
     
     if args.train:
         logger.info("Training ML model...")
         ml_matcher = MLIdentityMatcher()
-        results = ml_matcher.train(n_samples=settings.TRAINING_SAMPLES)
+        results = ml_matcher.train(n_samples=settings.TRAINING_SAMPLES, cache_dir=args.synthetic_cache_dir)
         logger.info(f"Training completed: {results}")
         
         if args.save_model:
             ml_matcher.save_model(args.save_model)
             logger.info(f"Model saved to {args.save_model}")
     
+    elif args.serve:
+        # Never trains on the request path: without a model only rule-based results are served
+        serve_jsonl(MatchingService(model_path=args.model))
+    
+    elif args.dedup:
+        stats = run_dedup(
+            args.dedup,
+            pairs_out=args.pairs_out,
+            clusters_out=args.clusters_out,
+            method=args.method,
+            input_format=args.input_format,
+            model_path=args.model,
+            cluster_index=args.cluster_index,
+            fuzzy_k=args.fuzzy_k
+        )
+        print(json.dumps(stats.dict(), indent=2))
+    
     elif args.record1 and args.record2:
         try:
             record1_data = json.loads(args.record1)
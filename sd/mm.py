@@ -7,103 +7,109 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, accuracy_score, roc_auc_score
 from sklearn.preprocessing import StandardScaler
 import joblib
-from typing import Dict, List, Optional
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from faker import Faker
 import random
 import string
 import re
 from difflib import SequenceMatcher
-from jellyfish import jaro_winkler_similarity, soundex
+from jellyfish import jaro_winkler_similarity
 import Levenshtein
 from config import settings
-from utils import extract_email_username, normalize_phone_number, standardize_address_abbreviations
 from loguru import logger
-from models import IdentityRecord
+from models import IdentityRecord, BatchSimilarityResult
+from normalization import NormalizationCache, NormalizedRecord, normalization_cache
+from compiled_model import CompiledForest, export_compiled_model
+
+FEATURE_NAMES = [
+    'email_sim', 'name_sim', 'phonetic_sim', 'phone_sim', 'address_sim',
+    'email_exact', 'name_exact', 'phone_exact', 'address_exact',
+    'email_has_numbers1', 'email_has_numbers2', 'email_numbers_diff',
+    'email_edit_dist', 'name_edit_dist', 'address_edit_dist',
+    'email_len_diff', 'name_len_diff',
+    'email_lev_ratio', 'name_lev_ratio',
+    'domain_match'
+]
+
+# Bump whenever the pair generator or a feature computation changes: it is part of the
+# synthetic feature cache key, so older cached matrices are not reused
+SYNTHETIC_GENERATOR_VERSION = 1
+
+def feature_set_key() -> str:
+    """Short hash of the feature names and generator version"""
+    spec = f"v{SYNTHETIC_GENERATOR_VERSION}:" + ",".join(FEATURE_NAMES)
+    return hashlib.sha1(spec.encode()).hexdigest()[:12]
 
 class MLIdentityMatcher:
-    def __init__(self, model_type: str = "random_forest"):
+    def __init__(self, model_type: str = "random_forest", cache: NormalizationCache = None):
         self.model = None
         self.scaler = StandardScaler()
         self.feature_names = None
         self.fake = Faker()
+        self.rng = random.Random()
         self.model_type = model_type
         self.is_trained = False
+        self.cache = cache if cache is not None else normalization_cache
         
-    def _extract_features(self, record1: IdentityRecord, record2: IdentityRecord) -> np.array:
-        """Extract comprehensive features for ML model"""
-        # Normalize fields
-        email1_norm = extract_email_username(record1.email or '')
-        email2_norm = extract_email_username(record2.email or '')
-        
-        name1_norm = re.sub(r'[^\w\s]', '', (record1.name or '').lower()).strip()
-        name2_norm = re.sub(r'[^\w\s]', '', (record2.name or '').lower()).strip()
-        
-        try:
-            phone1_norm, _ = normalize_phone_number(record1.phone or '')
-            phone2_norm, _ = normalize_phone_number(record2.phone or '')
-        except:
-            phone1_norm = record1.phone or ''
-            phone2_norm = record2.phone or ''
-        
-        addr1_norm = standardize_address_abbreviations(record1.address or '', settings.ADDRESS_ABBREVIATIONS)
-        addr2_norm = standardize_address_abbreviations(record2.address or '', settings.ADDRESS_ABBREVIATIONS)
+    def _fill_features(self, record1: NormalizedRecord, record2: NormalizedRecord, out: np.ndarray):
+        """Write the pair features for two normalized records into a preallocated row"""
+        email1_norm, email2_norm = record1.email_username, record2.email_username
+        name1_norm, name2_norm = record1.name_norm, record2.name_norm
+        phone1_norm, phone2_norm = record1.phone_e164, record2.phone_e164
+        addr1_norm, addr2_norm = record1.address_std, record2.address_std
+        soundex1, soundex2 = record1.name_soundex, record2.name_soundex
+        email_has_numbers1 = 1.0 if record1.email_has_numbers else 0.0
+        email_has_numbers2 = 1.0 if record2.email_has_numbers else 0.0
+        domain1, domain2 = record1.email_domain, record2.email_domain
         
         # Compute similarities
         email_sim = SequenceMatcher(None, email1_norm, email2_norm).ratio() if email1_norm and email2_norm else (1.0 if not email1_norm and not email2_norm else 0.0)
         name_sim = jaro_winkler_similarity(name1_norm, name2_norm) if name1_norm and name2_norm else (1.0 if not name1_norm and not name2_norm else 0.0)
-        
-        try:
-            phonetic_sim = 1.0 if soundex(name1_norm) == soundex(name2_norm) else 0.0
-        except:
-            phonetic_sim = 0.0
-            
+        phonetic_sim = 1.0 if soundex1 is not None and soundex2 is not None and soundex1 == soundex2 else 0.0
         phone_sim = 1.0 if phone1_norm == phone2_norm else 0.0
         address_sim = SequenceMatcher(None, addr1_norm, addr2_norm).ratio() if addr1_norm and addr2_norm else (1.0 if not addr1_norm and not addr2_norm else 0.0)
         
+        out[0] = email_sim
+        out[1] = name_sim
+        out[2] = phonetic_sim
+        out[3] = phone_sim
+        out[4] = address_sim
+        
         # Exact matches
-        email_exact = 1.0 if email1_norm == email2_norm else 0.0
-        name_exact = 1.0 if name1_norm == name2_norm else 0.0
-        phone_exact = 1.0 if phone1_norm == phone2_norm else 0.0
-        address_exact = 1.0 if addr1_norm == addr2_norm else 0.0
+        out[5] = 1.0 if email1_norm == email2_norm else 0.0
+        out[6] = 1.0 if name1_norm == name2_norm else 0.0
+        out[7] = phone_sim
+        out[8] = 1.0 if addr1_norm == addr2_norm else 0.0
         
         # Pattern features
-        email_has_numbers1 = 1.0 if re.search(r'\d', record1.email or '') else 0.0
-        email_has_numbers2 = 1.0 if re.search(r'\d', record2.email or '') else 0.0
-        email_numbers_diff = abs(email_has_numbers1 - email_has_numbers2)
+        out[9] = email_has_numbers1
+        out[10] = email_has_numbers2
+        out[11] = abs(email_has_numbers1 - email_has_numbers2)
         
         # Edit distances
-        email_edit_dist = 1.0 - email_sim if email_sim > 0 else 1.0
-        name_edit_dist = 1.0 - name_sim if name_sim > 0 else 1.0
-        address_edit_dist = 1.0 - address_sim if address_sim > 0 else 1.0
+        out[12] = 1.0 - email_sim if email_sim > 0 else 1.0
+        out[13] = 1.0 - name_sim if name_sim > 0 else 1.0
+        out[14] = 1.0 - address_sim if address_sim > 0 else 1.0
         
         # Length differences
-        email_len_diff = abs(len(email1_norm) - len(email2_norm)) / (max(len(email1_norm), len(email2_norm)) or 1)
-        name_len_diff = abs(len(name1_norm) - len(name2_norm)) / (max(len(name1_norm), len(name2_norm)) or 1)
+        out[15] = abs(len(email1_norm) - len(email2_norm)) / (max(len(email1_norm), len(email2_norm)) or 1)
+        out[16] = abs(len(name1_norm) - len(name2_norm)) / (max(len(name1_norm), len(name2_norm)) or 1)
         
         # Levenshtein ratios
-        email_lev_ratio = 1.0 - (Levenshtein.distance(email1_norm, email2_norm) / max(len(email1_norm), len(email2_norm), 1))
-        name_lev_ratio = 1.0 - (Levenshtein.distance(name1_norm, name2_norm) / max(len(name1_norm), len(name2_norm), 1))
+        out[17] = 1.0 - (Levenshtein.distance(email1_norm, email2_norm) / max(len(email1_norm), len(email2_norm), 1))
+        out[18] = 1.0 - (Levenshtein.distance(name1_norm, name2_norm) / max(len(name1_norm), len(name2_norm), 1))
         
         # Domain matching
-        try:
-            domain1 = record1.email.split('@')[1] if record1.email and '@' in record1.email else ''
-            domain2 = record2.email.split('@')[1] if record2.email and '@' in record2.email else ''
-            domain_match = 1.0 if domain1 == domain2 and domain1 else 0.0
-        except:
-            domain_match = 0.0
-        
-        # Combine all features
-        features = [
-            email_sim, name_sim, phonetic_sim, phone_sim, address_sim,
-            email_exact, name_exact, phone_exact, address_exact,
-            email_has_numbers1, email_has_numbers2, email_numbers_diff,
-            email_edit_dist, name_edit_dist, address_edit_dist,
-            email_len_diff, name_len_diff,
-            email_lev_ratio, name_lev_ratio,
-            domain_match
-        ]
-        
-        return np.array(features)
+        out[19] = 1.0 if domain1 == domain2 and domain1 else 0.0
+    
+    def _extract_features(self, record1: IdentityRecord, record2: IdentityRecord) -> np.array:
+        """Extract comprehensive features for ML model"""
+        features = np.empty(len(FEATURE_NAMES))
+        self._fill_features(self.cache.get(record1), self.cache.get(record2), features)
+        return features
     
     def _generate_variation(self, base_record: IdentityRecord, variation_type: str) -> IdentityRecord:
         """Generate a variation of a base record"""
@@ -114,8 +120,8 @@ class MLIdentityMatcher:
                 username = email_parts[0]
                 domain = email_parts[1]
                 # Add numbers or change format
-                if random.random() < 0.5:
-                    new_username = username + str(random.randint(1, 999))
+                if self.rng.random() < 0.5:
+                    new_username = username + str(self.rng.randint(1, 999))
                 else:
                     new_username = re.sub(r'[._]', '', username)
                 variant_email = f"{new_username}@{domain}"
@@ -132,9 +138,9 @@ class MLIdentityMatcher:
             if base_record.name:
                 name_parts = base_record.name.split()
                 if len(name_parts) >= 2:
-                    if random.random() < 0.5:
+                    if self.rng.random() < 0.5:
                         # Add middle initial
-                        variant_name = f"{name_parts[0]} {random.choice(string.ascii_uppercase)}. {name_parts[1]}"
+                        variant_name = f"{name_parts[0]} {self.rng.choice(string.ascii_uppercase)}. {name_parts[1]}"
                     else:
                         # Reverse order
                         variant_name = f"{name_parts[1]} {name_parts[0]}"
@@ -179,15 +185,18 @@ class MLIdentityMatcher:
         else:  # mixed
             # Apply multiple modifications
             temp_record = base_record
-            modifications = random.sample(['email', 'name', 'phone', 'address'], random.randint(2, 3))
+            modifications = self.rng.sample(['email', 'name', 'phone', 'address'], self.rng.randint(2, 3))
             for mod in modifications:
                 temp_record = self._generate_variation(temp_record, mod)
             return temp_record
     
-    def generate_synthetic_data(self, n_samples: int = 10000) -> pd.DataFrame:
-        """Generate synthetic identity data for training"""
-        data = []
-        feature_names = None
+    def _generate_feature_rows(self, n_samples: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Generate n_samples synthetic pairs deterministically from seed, writing features straight into an array"""
+        self.fake.seed_instance(seed)
+        self.rng.seed(seed)
+        
+        X = np.empty((n_samples, len(FEATURE_NAMES)), dtype=np.float64)
+        y = np.empty(n_samples, dtype=np.int8)
         
         for i in range(n_samples):
             # Generate base person
@@ -199,12 +208,12 @@ class MLIdentityMatcher:
             )
             
             # Decide if we're creating a match or non-match
-            is_match = random.random() < 0.5
+            is_match = self.rng.random() < 0.5
             
             if is_match:
                 # Create variation of the same person
                 variation_types = ['email', 'name', 'phone', 'address', 'mixed']
-                variation_type = random.choice(variation_types)
+                variation_type = self.rng.choice(variation_types)
                 variant_record = self._generate_variation(base_record, variation_type)
             else:
                 # Create completely different person
@@ -215,40 +224,75 @@ class MLIdentityMatcher:
                     address=self.fake.address().replace('\n', ', ')
                 )
             
-            # Extract features
-            features = self._extract_features(base_record, variant_record)
-            
-            # Set feature names on first iteration
-            if feature_names is None:
-                feature_names = [
-                    'email_sim', 'name_sim', 'phonetic_sim', 'phone_sim', 'address_sim',
-                    'email_exact', 'name_exact', 'phone_exact', 'address_exact',
-                    'email_has_numbers1', 'email_has_numbers2', 'email_numbers_diff',
-                    'email_edit_dist', 'name_edit_dist', 'address_edit_dist',
-                    'email_len_diff', 'name_len_diff',
-                    'email_lev_ratio', 'name_lev_ratio',
-                    'domain_match'
-                ]
-            
-            # Create row
-            row = list(features) + [int(is_match)]
-            data.append(row)
+            self._fill_features(self.cache.get(base_record), self.cache.get(variant_record), X[i])
+            y[i] = is_match
         
-        self.feature_names = feature_names
-        columns = feature_names + ['is_match']
-        return pd.DataFrame(data, columns=columns)
+        return X, y
     
-    def train(self, n_samples: int = None) -> dict:
-        """Train the ML model"""
+    def generate_feature_matrix(self, n_samples: int = 10000, n_jobs: int = None, cache_dir: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Generate (X, y) for training.
+        Samples are split into fixed-size shards, each with its own seed derived from
+        settings.RANDOM_STATE, so the result does not depend on the number of workers.
+        Shards are generated in a process pool. With a cache_dir (default
+        settings.SYNTHETIC_CACHE_DIR, empty = no cache) the matrices are cached as .npy keyed by
+        sample count, seed, shard size and feature_set_key(); cached matrices are opened memory-mapped.
+        """
+        seed = settings.RANDOM_STATE
+        shard_size = settings.SYNTHETIC_SHARD_SIZE
+        if n_jobs is None:
+            n_jobs = settings.SYNTHETIC_N_JOBS or os.cpu_count() or 1
+        if cache_dir is None:
+            cache_dir = settings.SYNTHETIC_CACHE_DIR
+        use_cache = bool(cache_dir)
+        self.feature_names = list(FEATURE_NAMES)
+        
+        cache_prefix = os.path.join(cache_dir, f"synthetic_n{n_samples}_seed{seed}_shard{shard_size}_f{feature_set_key()}")
+        if use_cache and os.path.exists(cache_prefix + "_X.npy") and os.path.exists(cache_prefix + "_y.npy"):
+            logger.info(f"Loading cached synthetic features from {cache_prefix}_*.npy")
+            return np.load(cache_prefix + "_X.npy", mmap_mode='r'), np.load(cache_prefix + "_y.npy", mmap_mode='r')
+        
+        shard_sizes = [min(shard_size, n_samples - start) for start in range(0, n_samples, shard_size)]
+        shard_seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(len(shard_sizes))]
+        
+        X = np.empty((n_samples, len(FEATURE_NAMES)), dtype=np.float64)
+        y = np.empty(n_samples, dtype=np.int8)
+        offsets = np.cumsum([0] + shard_sizes)
+        
+        if n_jobs == 1 or len(shard_sizes) == 1:
+            for k, (size, shard_seed) in enumerate(zip(shard_sizes, shard_seeds)):
+                X[offsets[k]:offsets[k + 1]], y[offsets[k]:offsets[k + 1]] = _generate_feature_shard(size, shard_seed)
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                for k, (shard_X, shard_y) in enumerate(executor.map(_generate_feature_shard, shard_sizes, shard_seeds)):
+                    X[offsets[k]:offsets[k + 1]] = shard_X
+                    y[offsets[k]:offsets[k + 1]] = shard_y
+        
+        if use_cache:
+            os.makedirs(cache_dir, exist_ok=True)
+            for suffix, array in (("_X.npy", X), ("_y.npy", y)):
+                tmp_path = cache_prefix + suffix + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, array)
+                os.replace(tmp_path, cache_prefix + suffix)
+            logger.info(f"Cached synthetic features to {cache_prefix}_*.npy")
+        
+        return X, y
+    
+    def generate_synthetic_data(self, n_samples: int = 10000) -> pd.DataFrame:
+        """Generate synthetic identity data for training"""
+        X, y = self.generate_feature_matrix(n_samples)
+        df = pd.DataFrame(np.asarray(X), columns=self.feature_names)
+        df['is_match'] = np.asarray(y, dtype=int)
+        return df
+    
+    def train(self, n_samples: int = None, cache_dir: Optional[str] = None) -> dict:
+        """Train the ML model (cache_dir: where synthetic features are cached, see generate_feature_matrix)"""
         if n_samples is None:
             n_samples = settings.TRAINING_SAMPLES
             
         logger.info(f"Generating {n_samples} synthetic training samples...")
-        df = self.generate_synthetic_data(n_samples)
-        
-        # Prepare features and target
-        X = df[self.feature_names].values
-        y = df['is_match'].values
+        X, y = self.generate_feature_matrix(n_samples, cache_dir=cache_dir)
         
         # Scale features
         X_scaled = self.scaler.fit_transform(X)
@@ -319,6 +363,21 @@ class MLIdentityMatcher:
         self.is_trained = True
         logger.info(f"Model loaded from {filepath}")
     
+    def export_compiled_model(self, filepath: str) -> float:
+        """Compile the trained random forest and scaler into a memory-mappable NumPy model"""
+        if not self.is_trained:
+            raise ValueError("Model not trained yet. Call train() first.")
+        return export_compiled_model(self.model, self.scaler, filepath, feature_names=self.feature_names)
+    
+    def load_compiled_model(self, filepath: str):
+        """Use a compiled model (see export_compiled_model) instead of the joblib pickle"""
+        compiled = CompiledForest.load(filepath)
+        self.model = compiled
+        self.scaler = compiled.scaler
+        self.feature_names = compiled.feature_names
+        self.model_type = "compiled_random_forest"
+        self.is_trained = True
+    
     def predict_similarity(self, record1: IdentityRecord, record2: IdentityRecord) -> float:
         """Predict similarity probability"""
         if not self.is_trained:
@@ -329,9 +388,51 @@ class MLIdentityMatcher:
         probability = self.model.predict_proba(features_scaled)[0][1]  # Probability of match
         return float(probability)
     
+    def predict_similarity_batch(self, pairs: List[Tuple[IdentityRecord, IdentityRecord]], chunk_size: int = None) -> np.ndarray:
+        """
+        Predict match probabilities for many pairs at once.
+        Each distinct record is normalized once (via the shared normalization cache), features are written into a preallocated
+        float32 matrix and the scaler/model run once per chunk of `chunk_size` pairs.
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet. Call train() first.")
+        if chunk_size is None:
+            chunk_size = settings.ML_BATCH_CHUNK_SIZE
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        
+        pairs = list(pairs)
+        probabilities = np.empty(len(pairs), dtype=np.float64)
+        if not pairs:
+            return probabilities
+        
+        features = np.empty((min(chunk_size, len(pairs)), len(FEATURE_NAMES)), dtype=np.float32)
+        for start in range(0, len(pairs), chunk_size):
+            chunk = pairs[start:start + chunk_size]
+            for row, (record1, record2) in enumerate(chunk):
+                self._fill_features(self.cache.get(record1), self.cache.get(record2), features[row])
+            
+            features_scaled = self.scaler.transform(features[:len(chunk)])
+            probabilities[start:start + len(chunk)] = self.model.predict_proba(features_scaled)[:, 1]
+        
+        return probabilities
+    
+    def score_batch(self, pairs: List[Tuple[IdentityRecord, IdentityRecord]], threshold: float = None, chunk_size: int = None) -> BatchSimilarityResult:
+        """Columnar batch result; for ML, confidence is the match probability"""
+        if threshold is None:
+            threshold = settings.ML_THRESHOLD
+        probabilities = self.predict_similarity_batch(pairs, chunk_size=chunk_size)
+        return BatchSimilarityResult(probabilities, probabilities >= threshold, probabilities, method="ml_based")
+    
     def is_same_person(self, record1: IdentityRecord, record2: IdentityRecord, threshold: float = None) -> bool:
         """Determine if two records likely represent the same person"""
         if threshold is None:
             threshold = settings.ML_THRESHOLD
         similarity = self.predict_similarity(record1, record2)
         return similarity >= threshold
+
+def _generate_feature_shard(n_samples: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Generate one shard of synthetic training data (runs in worker processes)"""
+    # Synthetic records are all distinct, so bypass the shared normalization cache
+    generator = MLIdentityMatcher(cache=NormalizationCache(maxsize=0))
+    return generator._generate_feature_rows(n_samples, seed)
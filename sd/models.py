@@ -1,6 +1,7 @@
 
+import numpy as np
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, NamedTuple, Optional
 
 class IdentityRecord(BaseModel):
     name: Optional[str] = None
@@ -18,3 +19,85 @@ class SimilarityResult(BaseModel):
     method: str
     confidence: float = 1.0
     details: Optional[dict] = None
+
+class CompactResult(NamedTuple):
+    """Lightweight pair result: plain floats, no details, no validation"""
+    similarity_score: float
+    is_same_person: bool
+    confidence: float
+
+class BatchSimilarityResult:
+    """Columnar results for many pairs, one NumPy array per field"""
+    __slots__ = ('similarity_score', 'is_same_person', 'confidence', 'method')
+    
+    def __init__(self, similarity_score: np.ndarray, is_same_person: np.ndarray, confidence: np.ndarray, method: str):
+        self.similarity_score = similarity_score
+        self.is_same_person = is_same_person
+        self.confidence = confidence
+        self.method = method
+    
+    def __len__(self):
+        return len(self.similarity_score)
+    
+    def __getitem__(self, index: int) -> CompactResult:
+        return CompactResult(
+            float(self.similarity_score[index]),
+            bool(self.is_same_person[index]),
+            float(self.confidence[index])
+        )
+    
+    def match_indices(self) -> np.ndarray:
+        """Positions of the pairs judged to be the same person"""
+        return np.flatnonzero(self.is_same_person)
+
+class BlockingStats(BaseModel):
+    n_records: int
+    pairs_generated: int
+    total_possible_pairs: int
+    reduction_ratio: float
+    pair_completeness: Optional[float] = None
+    block_counts: Dict[str, int] = {}
+    skipped_blocks: int = 0
+
+class FuzzyIndexStats(BaseModel):
+    n_records: int
+    num_perm: int
+    bands: int
+    rows: int
+    n_buckets: int
+    bucket_entries: int
+    signature_bytes: int
+    approx_bucket_bytes: int
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+    hit_rate: float
+
+class ClusterUpdateStats(BaseModel):
+    records_added: int
+    total_records: int
+    candidate_pairs: int
+    matched_pairs: int
+    entity_merges: int
+    entities: int
+    elapsed_seconds: float
+    records_per_second: float
+    pairs_per_second: float
+
+class WorkerThroughput(BaseModel):
+    pid: int
+    shards: int
+    pairs: int
+    busy_seconds: float
+    pairs_per_second: float
+
+class ParallelScoringStats(BaseModel):
+    n_workers: int
+    total_pairs: int
+    elapsed_seconds: float
+    pairs_per_second: float
+    workers: List[WorkerThroughput] = []
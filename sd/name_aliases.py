@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Sequence
+from config import settings
+from loguru import logger
+
+DEFAULT_ALIASES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'name_aliases.csv')
+
+def load_alias_groups(path: str) -> Dict[str, List[str]]:
+    """
+    Load {canonical: [aliases]} from JSON, or from CSV rows `canonical,alias,alias,...`
+    (lines starting with # are comments)
+    """
+    with open(path, newline='') as f:
+        if path.lower().endswith('.json'):
+            return {canonical: list(aliases) for canonical, aliases in json.load(f).items()}
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            groups[row[0]].extend(alias for alias in row[1:] if alias.strip())
+        return groups
+
+class NameAliasTable:
+    """
+    Given-name aliases compiled once into per-token lookups.
+    An alias can belong to several canonical names ('al' -> albert, alfred, alexander),
+    so each token maps to the frozenset of its canonical names; two tokens are
+    equivalent when they are equal or their sets intersect.
+    Only given-name tokens are aliased: in a multi-token name the last token is the
+    surname and must match exactly, so 'Will' or 'Bill' as surnames are never rewritten.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        forms: Dict[str, set] = defaultdict(set)
+        primary: Dict[str, str] = {}
+        for canonical, aliases in groups.items():
+            canonical = canonical.strip().lower()
+            forms[canonical].add(canonical)
+            primary[canonical] = canonical
+            for alias in aliases:
+                alias = alias.strip().lower()
+                forms[alias].add(canonical)
+                # First canonical listed for an alias is used for blocking keys
+                primary.setdefault(alias, canonical)
+
+        self.forms: Dict[str, FrozenSet[str]] = {token: frozenset(names) for token, names in forms.items()}
+        self.primary = primary
+
+    def __len__(self):
+        return len(self.forms)
+
+    def canonical(self, token: str) -> str:
+        """Primary canonical name of a token (the token itself if unknown)"""
+        return self.primary.get(token, token)
+
+    def canonicalize(self, name_norm: str) -> str:
+        """Replace every given-name token (all but the last) by its primary canonical name"""
+        tokens = name_norm.split()
+        if len(tokens) < 2:
+            return ' '.join(self.primary.get(token, token) for token in tokens)
+        return ' '.join([self.primary.get(token, token) for token in tokens[:-1]] + tokens[-1:])
+
+    def tokens_equivalent(self, token1: str, token2: str) -> bool:
+        if token1 == token2:
+            return True
+        forms1 = self.forms.get(token1)
+        forms2 = self.forms.get(token2)
+        if forms1 is None:
+            return forms2 is not None and token1 in forms2
+        if forms2 is None:
+            return token2 in forms1
+        return not forms1.isdisjoint(forms2)
+
+    def names_equivalent(self, tokens1: Sequence[str], tokens2: Sequence[str]) -> bool:
+        """
+        Same number of tokens, surnames (last tokens) equal and every given-name
+        token pair equal or aliases of each other
+        """
+        if len(tokens1) != len(tokens2):
+            return False
+        if len(tokens1) > 1 and tokens1[-1] != tokens2[-1]:
+            return False
+        return all(map(self.tokens_equivalent, tokens1[:-1] or tokens1, tokens2[:-1] or tokens2))
+
+def build_name_alias_table() -> NameAliasTable:
+    """Compile the bundled alias table plus the optional NAME_ALIASES_FILE once"""
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for path in filter(None, [DEFAULT_ALIASES_FILE, settings.NAME_ALIASES_FILE]):
+        for canonical, aliases in load_alias_groups(path).items():
+            groups[canonical].extend(aliases)
+    table = NameAliasTable(groups)
+    logger.debug(f"Compiled {len(table)} name alias tokens")
+    return table
+
+name_aliases = build_name_alias_table()
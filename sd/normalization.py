@@ -0,0 +1,127 @@
+import re
+from collections import OrderedDict
+from typing import Optional, Tuple
+from jellyfish import soundex
+from config import settings
+from name_aliases import name_aliases
+from utils import AbbreviationStandardizer, extract_email_username, load_abbreviation_table, normalize_phone_number, parse_address
+from loguru import logger
+from models import IdentityRecord, CacheStats
+
+def build_address_standardizer() -> AbbreviationStandardizer:
+    """Compile the configured abbreviation table (plus the optional table file) once"""
+    abbreviations = dict(settings.ADDRESS_ABBREVIATIONS)
+    if settings.ADDRESS_ABBREVIATIONS_FILE:
+        abbreviations.update(load_abbreviation_table(settings.ADDRESS_ABBREVIATIONS_FILE))
+        logger.info(f"Loaded {len(abbreviations)} address abbreviations")
+    return AbbreviationStandardizer(abbreviations)
+
+address_standardizer = build_address_standardizer()
+
+class NormalizedRecord:
+    """
+    All per-record normalization used by the matchers, computed once.
+    Address parsing (usaddress CRF tagging) is the most expensive step and only
+    runs the first time `address_parsed` is read.
+    """
+    __slots__ = (
+        'name', 'email', 'phone', 'address',
+        'name_norm', 'name_soundex', 'name_canonical',
+        'email_username', 'email_domain', 'email_has_numbers',
+        'phone_e164', 'phone_country',
+        'address_std', '_address_parsed'
+    )
+
+    def __init__(self, record: IdentityRecord):
+        self.name = record.name or ''
+        self.email = record.email or ''
+        self.phone = record.phone or ''
+        self.address = record.address or ''
+
+        self.name_norm = re.sub(r'[^\w\s]', '', self.name.lower()).strip()
+        try:
+            self.name_soundex = soundex(self.name_norm) if self.name_norm else ''
+        except Exception as e:
+            logger.warning(f"Soundex failed for name {self.name_norm}: {e}")
+            self.name_soundex = None
+        self.name_canonical = name_aliases.canonicalize(self.name_norm)
+
+        self.email_username = extract_email_username(self.email)
+        self.email_domain = self.email.split('@')[1] if '@' in self.email else ''
+        self.email_has_numbers = re.search(r'\d', self.email) is not None
+
+        try:
+            self.phone_e164, self.phone_country = normalize_phone_number(self.phone)
+        except Exception:
+            self.phone_e164, self.phone_country = self.phone, ''
+
+        self.address_std = address_standardizer.standardize(self.address)
+        self._address_parsed = None
+
+    @property
+    def address_parsed(self) -> dict:
+        """Parsed address components, computed lazily"""
+        if self._address_parsed is None:
+            self._address_parsed = parse_address(self.address)
+        return self._address_parsed
+
+def record_key(record: IdentityRecord) -> Tuple[str, str, str, str]:
+    """Cache key built from record content"""
+    return (record.name or '', record.email or '', record.phone or '', record.address or '')
+
+class NormalizationCache:
+    """Bounded LRU cache of NormalizedRecord keyed by record content"""
+
+    def __init__(self, maxsize: int = None):
+        self.maxsize = maxsize if maxsize is not None else settings.NORMALIZATION_CACHE_SIZE
+        self._entries: "OrderedDict[Tuple[str, str, str, str], NormalizedRecord]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, record: IdentityRecord) -> NormalizedRecord:
+        """Return the normalized form of a record, computing it on a miss"""
+        key = record_key(record)
+        normalized = self._entries.get(key)
+        if normalized is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return normalized
+
+        self.misses += 1
+        normalized = NormalizedRecord(record)
+        if self.maxsize > 0:
+            self._entries[key] = normalized
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return normalized
+
+    def clear(self):
+        """Drop all cached entries and reset counters"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> CacheStats:
+        """Hit/miss/eviction counters"""
+        lookups = self.hits + self.misses
+        return CacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            size=len(self._entries),
+            maxsize=self.maxsize,
+            hit_rate=self.hits / lookups if lookups else 0.0
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+# Process-wide cache shared by the rule-based and ML matchers
+normalization_cache = NormalizationCache()
+
+def normalize_record(record: IdentityRecord, cache: Optional[NormalizationCache] = None) -> NormalizedRecord:
+    """Normalize a record through the given cache (or the shared one)"""
+    return (cache if cache is not None else normalization_cache).get(record)
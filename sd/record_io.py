@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+from typing import IO, Iterator, Optional, Tuple
+
+SUPPORTED_FORMATS = ('csv', 'jsonl', 'parquet')
+
+def detect_format(path: str) -> str:
+    """Guess the file format from its extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    raise ValueError(f"Cannot detect format of {path}; use one of {SUPPORTED_FORMATS}")
+
+def _iter_csv(path: str) -> Iterator[dict]:
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield {key: (value if value != '' else None) for key, value in row.items()}
+
+def _iter_jsonl(path: str) -> Iterator[dict]:
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def _iter_parquet(path: str, batch_size: int) -> Iterator[dict]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet input requires pyarrow (pip install pyarrow)")
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield from batch.to_pylist()
+
+def read_records(path: str, fmt: Optional[str] = None, batch_size: int = 10000) -> Iterator[Tuple[str, dict]]:
+    """
+    Stream (record_id, row) tuples from a CSV, JSON-lines or Parquet file.
+    The record id is the 'id' column when present, otherwise the 0-based row number.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == 'csv':
+        rows = _iter_csv(path)
+    elif fmt == 'jsonl':
+        rows = _iter_jsonl(path)
+    elif fmt == 'parquet':
+        rows = _iter_parquet(path, batch_size)
+    else:
+        raise ValueError(f"Unsupported input format: {fmt}")
+
+    for row_number, row in enumerate(rows):
+        record_id = row.get('id')
+        yield (str(record_id) if record_id is not None else str(row_number)), row
+
+class RowWriter:
+    """Streamed CSV or JSON-lines writer chosen by file extension"""
+
+    def __init__(self, path: str, fieldnames: list):
+        self.fieldnames = fieldnames
+        self.is_csv = path.lower().endswith('.csv')
+        self._file: IO[str] = open(path, 'w', newline='', encoding='utf-8')
+        if self.is_csv:
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(fieldnames)
+
+    def write(self, row: tuple):
+        if self.is_csv:
+            self._writer.writerow(row)
+        else:
+            self._file.write(json.dumps(dict(zip(self.fieldnames, row))) + "\n")
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -2,118 +2,125 @@
 import re
 import numpy as np
 from difflib import SequenceMatcher
-from jellyfish import jaro_winkler_similarity, soundex
+from jellyfish import jaro_winkler_similarity
 import Levenshtein
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 from config import settings
-from utils import extract_email_username, normalize_phone_number, parse_address, standardize_address_abbreviations
 from loguru import logger
-from models import IdentityRecord, SimilarityResult
+from models import IdentityRecord, SimilarityResult, CompactResult, BatchSimilarityResult
+from normalization import NormalizationCache, NormalizedRecord, normalization_cache
+from name_aliases import name_aliases
+
+# Margin that keeps early-exit decisions identical to the full weighted sum despite float rounding
+BOUND_EPSILON = 1e-9
+
+STRING_METRICS = ('jaro_winkler', 'levenshtein', 'sequence_matcher', 'exact')
 
 class RuleBasedIdentityMatcher:
-    def __init__(self):
+    def __init__(self, cache: NormalizationCache = None):
         self.weights = settings.FIELD_WEIGHTS
         self.threshold = settings.RULE_BASED_THRESHOLD
+        self.cache = cache if cache is not None else normalization_cache
+        self.evaluation_order = settings.FIELD_EVALUATION_ORDER
+        self._comparators = {
+            'email': self._compute_email_similarity,
+            'name': self._compute_name_similarity,
+            'phone': self._compute_phone_similarity,
+            'address': self._compute_address_similarity
+        }
     
-    def _compute_string_similarity(self, str1: str, str2: str) -> dict:
-        """Compute multiple similarity metrics for strings"""
+    def _string_similarity_scores(self, str1: str, str2: str) -> Tuple[float, float, float, float]:
+        """String similarity metrics in STRING_METRICS order"""
         if not str1 and not str2:
-            return {
-                'jaro_winkler': 1.0,
-                'levenshtein': 1.0,
-                'sequence_matcher': 1.0,
-                'exact': 1.0
-            }
+            return 1.0, 1.0, 1.0, 1.0
         
         if not str1 or not str2:
-            return {
-                'jaro_winkler': 0.0,
-                'levenshtein': 0.0,
-                'sequence_matcher': 0.0,
-                'exact': 0.0
-            }
+            return 0.0, 0.0, 0.0, 0.0
         
         # Normalize strings
         norm1 = str1.lower().strip()
         norm2 = str2.lower().strip()
         
-        return {
-            'jaro_winkler': jaro_winkler_similarity(norm1, norm2),
-            'levenshtein': 1.0 - (Levenshtein.distance(norm1, norm2) / max(len(norm1), len(norm2))),
-            'sequence_matcher': SequenceMatcher(None, norm1, norm2).ratio(),
-            'exact': 1.0 if norm1 == norm2 else 0.0
-        }
+        return (
+            jaro_winkler_similarity(norm1, norm2),
+            1.0 - (Levenshtein.distance(norm1, norm2) / max(len(norm1), len(norm2))),
+            SequenceMatcher(None, norm1, norm2).ratio(),
+            1.0 if norm1 == norm2 else 0.0
+        )
     
-    def _compute_phonetic_similarity(self, name1: str, name2: str) -> float:
-        """Compare names using phonetic algorithms"""
-        try:
-            if not name1 and not name2:
-                return 1.0
-            if not name1 or not name2:
-                return 0.0
-                
-            s1 = soundex(name1)
-            s2 = soundex(name2)
-            return 1.0 if s1 == s2 else 0.0
-        except Exception as e:
-            logger.warning(f"Phonetic similarity failed: {e}")
+    def _compute_string_similarity(self, str1: str, str2: str) -> dict:
+        """Compute multiple similarity metrics for strings"""
+        return dict(zip(STRING_METRICS, self._string_similarity_scores(str1, str2)))
+    
+    def _compute_phonetic_similarity(self, record1: NormalizedRecord, record2: NormalizedRecord) -> float:
+        """Compare names using phonetic algorithms (soundex precomputed per record)"""
+        if not record1.name_norm and not record2.name_norm:
+            return 1.0
+        if not record1.name_norm or not record2.name_norm:
+            return 0.0
+        if record1.name_soundex is None or record2.name_soundex is None:
             return 0.0
+        return 1.0 if record1.name_soundex == record2.name_soundex else 0.0
     
-    def _compute_email_similarity(self, email1: str, email2: str) -> Tuple[float, dict]:
-        """Compute email similarity with detailed metrics"""
-        username1 = extract_email_username(email1)
-        username2 = extract_email_username(email2)
+    def _compute_email_similarity(self, record1: NormalizedRecord, record2: NormalizedRecord,
+                                  with_details: bool = True) -> Tuple[float, Optional[dict]]:
+        """Compute email similarity with detailed metrics (details is None unless with_details)"""
+        username1 = record1.email_username
+        username2 = record2.email_username
         
         if not username1 and not username2:
-            return 1.0, {'type': 'both_empty'}
+            return 1.0, ({'type': 'both_empty'} if with_details else None)
         
         if not username1 or not username2:
-            return 0.0, {'type': 'one_empty'}
+            return 0.0, ({'type': 'one_empty'} if with_details else None)
         
         # Exact match
         if username1 == username2:
-            return 1.0, {'type': 'exact_match'}
+            return 1.0, ({'type': 'exact_match'} if with_details else None)
         
         # Compute various similarities
-        similarities = self._compute_string_similarity(username1, username2)
+        similarities = self._string_similarity_scores(username1, username2)
         
         # Check for common variation patterns
         pattern_score = 0.0
-        if re.search(r'\d', email1) or re.search(r'\d', email2):
+        if record1.email_has_numbers or record2.email_has_numbers:
             pattern_score = 0.3  # Slight boost for number variations
         
         # Weighted combination
-        final_score = max(similarities.values()) * 0.7 + pattern_score * 0.3
+        final_score = max(similarities) * 0.7 + pattern_score * 0.3
         
+        if not with_details:
+            return min(final_score, 1.0), None
         return min(final_score, 1.0), {
-            'similarities': similarities,
+            'similarities': dict(zip(STRING_METRICS, similarities)),
             'pattern_boost': pattern_score,
             'type': 'fuzzy_match'
         }
     
-    def _compute_name_similarity(self, name1: str, name2: str) -> Tuple[float, dict]:
-        """Compute name similarity with phonetic matching"""
-        if not name1 and not name2:
-            return 1.0, {'type': 'both_empty'}
+    def _compute_name_similarity(self, record1: NormalizedRecord, record2: NormalizedRecord,
+                                 with_details: bool = True) -> Tuple[float, Optional[dict]]:
+        """Compute name similarity with phonetic matching (details is None unless with_details)"""
+        if not record1.name and not record2.name:
+            return 1.0, ({'type': 'both_empty'} if with_details else None)
         
-        if not name1 or not name2:
-            return 0.0, {'type': 'one_empty'}
+        if not record1.name or not record2.name:
+            return 0.0, ({'type': 'one_empty'} if with_details else None)
         
-        # Normalize names
-        norm1 = re.sub(r'[^\w\s]', '', name1.lower()).strip()
-        norm2 = re.sub(r'[^\w\s]', '', name2.lower()).strip()
+        # Normalized names
+        norm1 = record1.name_norm
+        norm2 = record2.name_norm
         
         if not norm1 and not norm2:
-            return 1.0, {'type': 'both_empty_after_norm'}
+            return 1.0, ({'type': 'both_empty_after_norm'} if with_details else None)
         
         if not norm1 or not norm2:
-            return 0.0, {'type': 'one_empty_after_norm'}
+            return 0.0, ({'type': 'one_empty_after_norm'} if with_details else None)
         
         # Direct similarity metrics
-        similarities = self._compute_string_similarity(norm1, norm2)
+        similarities = self._string_similarity_scores(norm1, norm2)
         
         # Phonetic similarity
-        phonetic_sim = self._compute_phonetic_similarity(norm1, norm2)
+        phonetic_sim = self._compute_phonetic_similarity(record1, record2)
         
         # Check reversed names (first last vs last first)
         reversed_sim = 0.0
@@ -123,88 +130,88 @@ class RuleBasedIdentityMatcher:
             reversed_name1 = f"{parts1[1]} {parts1[0]}"
             reversed_sim = jaro_winkler_similarity(reversed_name1, norm2)
         
-        # Nickname handling (basic)
+        # Nickname handling: every token equal or an alias of its counterpart (either order),
+        # with at least one token actually differing
         nickname_boost = 0.0
-        nicknames = {
-            'bob': 'robert', 'rob': 'robert', 'bill': 'william',
-            'jim': 'james', 'joe': 'joseph', 'mike': 'michael'
-        }
-        if norm1 in nicknames and nicknames[norm1] == norm2:
-            nickname_boost = 0.5
-        elif norm2 in nicknames and nicknames[norm2] == norm1:
+        if sorted(parts1) != sorted(parts2) and (name_aliases.names_equivalent(parts1, parts2) or
+                                                 name_aliases.names_equivalent(parts1[::-1], parts2)):
             nickname_boost = 0.5
         
         # Combine scores
-        max_string_sim = max(similarities.values())
+        max_string_sim = max(similarities)
         final_score = max(max_string_sim, phonetic_sim, reversed_sim) + nickname_boost
         
+        if not with_details:
+            return min(final_score, 1.0), None
         return min(final_score, 1.0), {
-            'string_similarities': similarities,
+            'string_similarities': dict(zip(STRING_METRICS, similarities)),
             'phonetic_similarity': phonetic_sim,
             'reversed_similarity': reversed_sim,
             'nickname_boost': nickname_boost,
             'type': 'complex_match' if final_score > 0.8 else 'low_similarity'
         }
     
-    def _compute_phone_similarity(self, phone1: str, phone2: str) -> Tuple[float, dict]:
-        """Compute phone similarity using phonenumbers library"""
-        if not phone1 and not phone2:
-            return 1.0, {'type': 'both_empty'}
+    def _compute_phone_similarity(self, record1: NormalizedRecord, record2: NormalizedRecord,
+                                  with_details: bool = True) -> Tuple[float, Optional[dict]]:
+        """Compute phone similarity using phonenumbers library (details is None unless with_details)"""
+        if not record1.phone and not record2.phone:
+            return 1.0, ({'type': 'both_empty'} if with_details else None)
         
-        if not phone1 or not phone2:
-            return 0.0, {'type': 'one_empty'}
+        if not record1.phone or not record2.phone:
+            return 0.0, ({'type': 'one_empty'} if with_details else None)
         
         try:
-            norm_phone1, country1 = normalize_phone_number(phone1)
-            norm_phone2, country2 = normalize_phone_number(phone2)
+            norm_phone1, country1 = record1.phone_e164, record1.phone_country
+            norm_phone2, country2 = record2.phone_e164, record2.phone_country
             
             if not norm_phone1 and not norm_phone2:
-                return 1.0, {'type': 'both_invalid'}
+                return 1.0, ({'type': 'both_invalid'} if with_details else None)
             
             if not norm_phone1 or not norm_phone2:
-                return 0.0, {'type': 'one_invalid'}
+                return 0.0, ({'type': 'one_invalid'} if with_details else None)
             
             # Exact match
             if norm_phone1 == norm_phone2:
-                return 1.0, {
+                return 1.0, ({
                     'type': 'exact_match',
                     'country_match': country1 == country2
-                }
+                } if with_details else None)
             
             # Partial match (last 7 digits for US numbers)
             if len(norm_phone1) >= 7 and len(norm_phone2) >= 7:
                 if norm_phone1[-7:] == norm_phone2[-7:]:
-                    return 0.8, {
+                    return 0.8, ({
                         'type': 'partial_match',
                         'match_type': 'last_7_digits'
-                    }
+                    } if with_details else None)
             
-            return 0.0, {'type': 'no_match'}
+            return 0.0, ({'type': 'no_match'} if with_details else None)
             
         except Exception as e:
             logger.warning(f"Phone similarity computation failed: {e}")
-            return 0.0, {'type': 'error', 'error': str(e)}
+            return 0.0, ({'type': 'error', 'error': str(e)} if with_details else None)
     
-    def _compute_address_similarity(self, addr1: str, addr2: str) -> Tuple[float, dict]:
-        """Compute address similarity with advanced parsing"""
-        if not addr1 and not addr2:
-            return 1.0, {'type': 'both_empty'}
+    def _compute_address_similarity(self, record1: NormalizedRecord, record2: NormalizedRecord,
+                                    with_details: bool = True) -> Tuple[float, Optional[dict]]:
+        """Compute address similarity with advanced parsing (details is None unless with_details)"""
+        if not record1.address and not record2.address:
+            return 1.0, ({'type': 'both_empty'} if with_details else None)
         
-        if not addr1 or not addr2:
-            return 0.0, {'type': 'one_empty'}
+        if not record1.address or not record2.address:
+            return 0.0, ({'type': 'one_empty'} if with_details else None)
         
-        # Standardize abbreviations
-        std_addr1 = standardize_address_abbreviations(addr1, settings.ADDRESS_ABBREVIATIONS)
-        std_addr2 = standardize_address_abbreviations(addr2, settings.ADDRESS_ABBREVIATIONS)
+        # Standardized abbreviations
+        std_addr1 = record1.address_std
+        std_addr2 = record2.address_std
         
         # Basic string similarity
-        string_sim = self._compute_string_similarity(std_addr1, std_addr2)
-        max_string_sim = max(string_sim.values())
+        string_sim = self._string_similarity_scores(std_addr1, std_addr2)
+        max_string_sim = max(string_sim)
         
         # Parse addresses for component matching
         try:
-            parsed1 = parse_address(addr1)
-            parsed2 = parse_address(addr2)
+            parsed1 = record1.address_parsed
+            parsed2 = record2.address_parsed
             
             if parsed1 and parsed2:
                 # Compare key components
@@ -223,52 +230,83 @@ class RuleBasedIdentityMatcher:
                     component_score = component_matches / total_components
                     # Combine with string similarity
                     final_score = (max_string_sim + component_score) / 2
-                    return min(final_score, 1.0), {
+                    return min(final_score, 1.0), ({
                         'type': 'parsed_match',
                         'component_score': component_score,
                         'string_similarity': max_string_sim
-                    }
+                    } if with_details else None)
         except Exception as e:
             logger.warning(f"Address parsing failed: {e}")
         
-        return max_string_sim, {
+        return max_string_sim, ({
             'type': 'string_match',
-            'similarities': string_sim
-        }
+            'similarities': dict(zip(STRING_METRICS, string_sim))
+        } if with_details else None)
     
-    def compute_similarity(self, record1: IdentityRecord, record2: IdentityRecord) -> SimilarityResult:
-        """Compute overall similarity between two identity records"""
-        try:
-            # Compute individual field similarities
-            email_sim, email_details = self._compute_email_similarity(record1.email or '', record2.email or '')
-            name_sim, name_details = self._compute_name_similarity(record1.name or '', record2.name or '')
-            phone_sim, phone_details = self._compute_phone_similarity(record1.phone or '', record2.phone or '')
-            address_sim, address_details = self._compute_address_similarity(record1.address or '', record2.address or '')
+    def _evaluate(self, norm1: NormalizedRecord, norm2: NormalizedRecord, early_exit: bool = False,
+                  with_details: bool = True) -> Tuple[float, bool, dict, list]:
+        """
+        Run the field comparators and return (similarity, is_same, field results, skipped fields).
+        Without with_details the comparators skip building their per-field details (None).
+        With early_exit, fields are evaluated from cheapest to most expensive and evaluation stops
+        once the remaining weight can no longer move the score across the threshold in either
+        direction; similarity is then the score over the evaluated fields (a lower bound).
+        """
+        order = self.evaluation_order if early_exit else list(self.weights)
+        field_results = {}
+        skipped_fields = []
+        partial = 0.0
+        decision = None
+        
+        for position, field in enumerate(order):
+            if decision is not None:
+                skipped_fields.append(field)
+                continue
             
-            # Weighted average
-            similarity = (
-                self.weights['email'] * email_sim +
-                self.weights['name'] * name_sim +
-                self.weights['phone'] * phone_sim +
-                self.weights['address'] * address_sim
-            )
+            field_results[field] = self._comparators[field](norm1, norm2, with_details)
+            if not early_exit:
+                continue
+            
+            partial += self.weights[field] * field_results[field][0]
+            remaining = sum(self.weights[f] for f in order[position + 1:])
+            if partial >= self.threshold + BOUND_EPSILON:
+                decision = True
+            elif partial + remaining < self.threshold - BOUND_EPSILON:
+                decision = False
+        
+        if skipped_fields:
+            return partial, decision, field_results, skipped_fields
+        
+        # Weighted average
+        similarity = sum(self.weights[field] * field_results[field][0] for field in self.weights)
+        return similarity, similarity >= self.threshold, field_results, skipped_fields
+    
+    def compute_similarity(self, record1: IdentityRecord, record2: IdentityRecord, early_exit: bool = False) -> SimilarityResult:
+        """
+        Compute overall similarity between two identity records.
+        With early_exit=True, fields that cannot change the is_same_person decision
+        are skipped and listed in details['skipped_fields'].
+        """
+        try:
+            norm1 = self.cache.get(record1)
+            norm2 = self.cache.get(record2)
             
-            # Determine if same person
-            is_same = similarity >= self.threshold
+            similarity, is_same, field_results, skipped_fields = self._evaluate(norm1, norm2, early_exit)
             
-            # Confidence based on highest similarity score
-            max_field_sim = max(email_sim, name_sim, phone_sim, address_sim)
-            confidence = min(similarity + (1 - similarity) * 0.3, 1.0)  # Boost confidence slightly
+            # Boost confidence slightly
+            confidence = min(similarity + (1 - similarity) * 0.3, 1.0)
             
             details = {
                 'field_similarities': {
-                    'email': {'score': email_sim, 'details': email_details},
-                    'name': {'score': name_sim, 'details': name_details},
-                    'phone': {'score': phone_sim, 'details': phone_details},
-                    'address': {'score': address_sim, 'details': address_details}
+                    field: {'score': score, 'details': field_details}
+                    for field, (score, field_details) in field_results.items()
                 },
                 'weights_used': self.weights
             }
+            if early_exit:
+                upper_bound = similarity + sum(self.weights[field] for field in skipped_fields)
+                details['skipped_fields'] = skipped_fields
+                details['score_bounds'] = (float(similarity), float(min(upper_bound, 1.0)))
             
             return SimilarityResult(
                 similarity_score=float(similarity),
@@ -288,7 +326,30 @@ class RuleBasedIdentityMatcher:
                 details={'error': str(e)}
             )
     
+    def score(self, record1: IdentityRecord, record2: IdentityRecord, early_exit: bool = False) -> CompactResult:
+        """Score a pair without building any details dicts or a pydantic model"""
+        try:
+            similarity, is_same, _, _ = self._evaluate(self.cache.get(record1), self.cache.get(record2), early_exit,
+                                                       with_details=False)
+            confidence = min(similarity + (1 - similarity) * 0.3, 1.0)
+            return CompactResult(float(similarity), is_same, float(confidence))
+        except Exception as e:
+            logger.error(f"Error computing similarity: {e}")
+            return CompactResult(0.0, False, 0.0)
+    
+    def score_batch(self, pairs: List[Tuple[IdentityRecord, IdentityRecord]], early_exit: bool = False) -> BatchSimilarityResult:
+        """Score many pairs into columnar NumPy arrays"""
+        pairs = list(pairs)
+        scores = np.empty(len(pairs), dtype=np.float64)
+        decisions = np.empty(len(pairs), dtype=bool)
+        confidences = np.empty(len(pairs), dtype=np.float64)
+        
+        for i, (record1, record2) in enumerate(pairs):
+            scores[i], decisions[i], confidences[i] = self.score(record1, record2, early_exit)
+        
+        return BatchSimilarityResult(scores, decisions, confidences, method="rule_based")
+    
     def is_same_person(self, record1: IdentityRecord, record2: IdentityRecord) -> bool:
         """Simple interface to check if two records represent the same person"""
-        result = self.compute_similarity(record1, record2)
+        result = self.compute_similarity(record1, record2, early_exit=True)
         return result.is_same_person
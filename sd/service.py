@@ -0,0 +1,130 @@
+import json
+import sys
+import time
+from typing import IO, List, Tuple
+from rule_based_matcher import RuleBasedIdentityMatcher
+from mm import MLIdentityMatcher
+from models import IdentityRecord, SimilarityResult
+from config import settings
+from loguru import logger
+
+class MatchingService:
+    """
+    Long-lived matchers: the ML model is loaded once at startup and both
+    matchers (and the shared normalization cache) stay warm across requests.
+    """
+
+    def __init__(self, model_path: str = None, train_if_missing: bool = False):
+        self.model_path = model_path or settings.MODEL_PATH
+        self.rule_matcher = RuleBasedIdentityMatcher()
+        self.ml_matcher = MLIdentityMatcher()
+        self.ml_available = False
+
+        start_time = time.time()
+        try:
+            self.ml_matcher.load_model(self.model_path)
+            self.ml_available = True
+        except FileNotFoundError:
+            if train_if_missing:
+                logger.warning("No pre-trained model found. Training new model...")
+                self.ml_matcher.train(n_samples=1000)  # Quick training for demo
+                self.ml_available = True
+            else:
+                logger.warning(f"No pre-trained model at {self.model_path}; serving rule-based results only")
+        logger.info(f"Matching service ready in {time.time() - start_time:.2f}s (ml_available={self.ml_available})")
+
+    def compare(self, record1: IdentityRecord, record2: IdentityRecord) -> dict:
+        """Full comparison of one pair, with details (same shape as main.compare_records)"""
+        rule_result = self.rule_matcher.compute_similarity(record1, record2)
+
+        if not self.ml_available:
+            ml_result = SimilarityResult(
+                similarity_score=0.0,
+                is_same_person=False,
+                method="ml_based",
+                confidence=0.0,
+                details={'error': 'ML model not loaded'}
+            )
+        else:
+            try:
+                ml_similarity = self.ml_matcher.predict_similarity(record1, record2)
+                ml_result = SimilarityResult(
+                    similarity_score=ml_similarity,
+                    is_same_person=ml_similarity >= settings.ML_THRESHOLD,
+                    method="ml_based",
+                    confidence=ml_similarity  # For ML, confidence is the probability
+                )
+            except Exception as e:
+                logger.error(f"ML prediction failed: {e}")
+                ml_result = SimilarityResult(
+                    similarity_score=0.0,
+                    is_same_person=False,
+                    method="ml_based",
+                    confidence=0.0,
+                    details={'error': str(e)}
+                )
+
+        return {
+            'rule_based': rule_result.dict(),
+            'ml_based': ml_result.dict()
+        }
+
+    def compare_batch(self, pairs: List[Tuple[IdentityRecord, IdentityRecord]]) -> List[dict]:
+        """Compact comparison of many pairs: one rule pass and one ML batch prediction"""
+        rule_results = self.rule_matcher.score_batch(pairs)
+        ml_results = self.ml_matcher.score_batch(pairs) if self.ml_available else None
+
+        results = []
+        for i in range(len(pairs)):
+            result = {'rule_based': rule_results[i]._asdict()}
+            result['ml_based'] = ml_results[i]._asdict() if ml_results is not None else None
+            results.append(result)
+        return results
+
+    def handle_request(self, request: dict) -> dict:
+        """
+        Handle one request. Accepted shapes:
+          {"id": ..., "record1": {...}, "record2": {...}}
+          {"id": ..., "pairs": [[{...}, {...}], ...], "details": false}
+        """
+        response = {'id': request.get('id')}
+
+        if 'pairs' in request:
+            pairs = [(IdentityRecord(**r1), IdentityRecord(**r2)) for r1, r2 in request['pairs']]
+            if request.get('details'):
+                response['results'] = [self.compare(r1, r2) for r1, r2 in pairs]
+            else:
+                response['results'] = self.compare_batch(pairs)
+        elif 'record1' in request and 'record2' in request:
+            response['result'] = self.compare(IdentityRecord(**request['record1']), IdentityRecord(**request['record2']))
+        else:
+            raise ValueError("Request must contain 'pairs' or 'record1' and 'record2'")
+
+        return response
+
+def serve_jsonl(service: MatchingService, input_stream: IO[str] = None, output_stream: IO[str] = None):
+    """Read one JSON request per line and write one JSON response per line"""
+    input_stream = input_stream or sys.stdin
+    output_stream = output_stream or sys.stdout
+
+    logger.info("Serving JSON-lines requests on stdin")
+    for line in input_stream:
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = service.handle_request(request)
+        except json.JSONDecodeError as e:
+            response = {'id': None, 'error': f"Invalid JSON input: {e}"}
+        except Exception as e:
+            logger.error(f"Error handling request {request_id}: {e}")
+            response = {'id': request_id, 'error': str(e)}
+
+        output_stream.write(json.dumps(response) + "\n")
+        output_stream.flush()
+
+    logger.info("Input closed, shutting down")
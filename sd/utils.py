@@ -1,7 +1,10 @@
 
+import csv
+import json
 import re
 import phonenumbers
-from typing import Tuple, Optional
+from functools import lru_cache
+from typing import Dict, Tuple, Optional, Union
 import usaddress
 from loguru import logger
 
@@ -55,12 +58,54 @@ def extract_email_username(email: str) -> str:
     username = re.sub(r'[_\-\.]+', '', username)  # Remove separators
     return username
 
-def standardize_address_abbreviations(address: str, abbreviations: dict) -> str:
-    """Standardize address abbreviations"""
-    if not address:
-        return ""
-    
-    address_lower = address.lower()
-    for abbr, full in abbreviations.items():
-        address_lower = re.sub(r'\b' + abbr + r'\b', full, address_lower)
-    return address_lower
+_WORD_PATTERN = re.compile(r'\w+')
+
+class AbbreviationStandardizer:
+    """
+    Address abbreviation expansion compiled once into a token lookup.
+    Every word is matched by one precompiled pattern and looked up in a dict, so the
+    cost per address does not depend on the table size (USPS suffix lists included).
+    Replacements are applied in a single pass and are not re-expanded.
+    """
+
+    def __init__(self, abbreviations: Dict[str, str]):
+        self.table = {abbr.lower(): full for abbr, full in abbreviations.items()}
+        invalid = [abbr for abbr in self.table if not _WORD_PATTERN.fullmatch(abbr)]
+        if invalid:
+            raise ValueError(f"Abbreviations must be single word tokens: {invalid[:5]}")
+        lookup = self.table.get
+        self._replace = lambda match: lookup(match.group(0), match.group(0))
+
+    def __len__(self):
+        return len(self.table)
+
+    def standardize(self, address: str) -> str:
+        """Lowercase the address and expand every known abbreviation"""
+        if not address:
+            return ""
+        return _WORD_PATTERN.sub(self._replace, address.lower())
+
+def load_abbreviation_table(path: str) -> Dict[str, str]:
+    """Load an abbreviation table from JSON ({abbr: full}) or a two-column CSV (abbr,full)"""
+    with open(path, newline='') as f:
+        if path.lower().endswith('.json'):
+            return {str(abbr): str(full) for abbr, full in json.load(f).items()}
+        return {row[0].strip(): row[1].strip() for row in csv.reader(f) if len(row) >= 2 and row[0].strip()}
+
+ABBREVIATION_CACHE_SIZE = 8
+
+@lru_cache(maxsize=ABBREVIATION_CACHE_SIZE)
+def _compile_abbreviations(items: Tuple[Tuple[str, str], ...]) -> AbbreviationStandardizer:
+    return AbbreviationStandardizer(dict(items))
+
+def standardize_address_abbreviations(address: str,
+                                      abbreviations: Union[dict, AbbreviationStandardizer]) -> str:
+    """
+    Standardize address abbreviations.
+    Pass a prebuilt AbbreviationStandardizer on hot paths; a plain dict is compiled on
+    first use and kept in a small LRU keyed by a snapshot of its contents, so later
+    edits to the dict are picked up.
+    """
+    if not isinstance(abbreviations, AbbreviationStandardizer):
+        abbreviations = _compile_abbreviations(tuple(abbreviations.items()))
+    return abbreviations.standardize(address)